@@ -1,25 +1,36 @@
-# Using simple strings for enums is fine in MicroPython to avoid Enum import.
+from micropython import const
+
+# Plain constants instead of Enum classes (no Enum import in MicroPython). Values checked on every message or HW
+# action (DeviceState, OS_MSG_TYPE_*) are const() small ints: compared and hashed without touching the heap.
+# Everything else (command actions, the broadcast recipient) is a plain string literal, never built with
+# f-strings/concatenation: when this module is frozen (see manifest.py) the literals become ROM qstrs.
+
+# Device states are small ints: checked on every HW action, int equality is cheaper than str compare.
 class DeviceState:
-    UNINITIALIZED = "UNINITIALIZED"
-    INITIALIZING = "INITIALIZING"
-    READY = "READY"
-    FAILED = "FAILED"
-    DISABLED = "DISABLED" # For devices manually disabled
-
-# OS Message Types
-OS_MSG_TYPE_HW_ACTION = 'hw_action' # Service -> OS to request HW op
-OS_MSG_TYPE_HW_ACTION_RESPONSE = 'hw_action_response' # OS -> Service with result of HW op
-
-OS_MSG_TYPE_HW_RESOURCE_LOCK_REQUEST = 'hw_resource_lock_request' # For exclusive delegation
-OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE = 'hw_resource_lock_response'
-
-OS_MSG_TYPE_OS_COMMAND = 'os_command' #! Renamed for clarity (was 'command')
-OS_MSG_TYPE_SERVICE_COMMAND = 'service_command' # OS/Service -> Service for service-specific actions
-
-OS_MSG_TYPE_STATUS_REPORT = 'status_report' # OS -> Requester with system status
-OS_MSG_TYPE_LOG = 'log_message' # Service -> OS for centralized logging (optional)
-OS_MSG_TYPE_BROADCAST = 'broadcast' # Special recipient for OS to distribute
-OS_MSG_TYPE_STORAGE_UPDATE = 'storage_update' #! Specific type for storage changes
+    UNINITIALIZED = const(0)
+    INITIALIZING = const(1)
+    READY = const(2)
+    FAILED = const(3)
+    DISABLED = const(4) # For devices manually disabled
+
+DEVICE_STATE_NAMES = ('UNINITIALIZED', 'INITIALIZING', 'READY', 'FAILED', 'DISABLED') # Indexed by DeviceState, for logs/status only
+
+# OS Message Types: small ints, compared/hashed on every routed message. Service-defined broadcast types
+# ('temperature_update', ...) stay strings and never collide with these.
+OS_MSG_TYPE_HW_ACTION = const(1) # Service -> OS to request HW op
+OS_MSG_TYPE_HW_ACTION_RESPONSE = const(2) # OS -> Service with result of HW op
+
+OS_MSG_TYPE_HW_RESOURCE_LOCK_REQUEST = const(3) # For exclusive delegation
+OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE = const(4)
+
+OS_MSG_TYPE_OS_COMMAND = const(5) #! Renamed for clarity (was 'command')
+OS_MSG_TYPE_SERVICE_COMMAND = const(6) # OS/Service -> Service for service-specific actions
+
+OS_MSG_TYPE_STATUS_REPORT = const(7) # OS -> Requester with system status
+OS_MSG_TYPE_LOG = const(8) # Service -> OS for centralized logging (optional)
+OS_MSG_TYPE_STORAGE_UPDATE = const(9) #! Specific type for storage changes
+OS_MSG_TYPE_STORAGE_DIRTY = const(10) # OS -> subscribers once per clean->dirty transition of storage (no payload)
+OS_MSG_TYPE_BROADCAST = 'broadcast' # Special recipient (not a type) for OS to distribute: stays a str like service names
 
 # OS Command Actions (for msg_type OS_MSG_TYPE_OS_COMMAND)
 OS_CMD_CREATE_SERVICE = 'create_service'
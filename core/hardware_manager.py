@@ -1,17 +1,116 @@
 import asyncio
 import sys 
 from machine import Pin, ADC 
-from lib.urtc import DS3231
-from lib.machine_i2c_lcd import I2cLcd 
 
-from .constants import DeviceState # Removed unused HW_RES_ACTION constants
+from .constants import DeviceState, DEVICE_STATE_NAMES # Removed unused HW_RES_ACTION constants
 
-DRIVER_CLASS_MAP = {
-    "DS3231": DS3231,
-    "LCD_I2C": I2cLcd,
-    "GPIO_Pin": Pin, 
-    "ADC_Pin": ADC,   
+# Driver classes are imported on first use so boards without an RTC/LCD never load lib.urtc / lib.machine_i2c_lcd.
+def _load_ds3231():
+    from lib.urtc import DS3231
+    return DS3231
+
+def _load_i2c_lcd():
+    from lib.machine_i2c_lcd import I2cLcd
+    return I2cLcd
+
+_DRIVER_LOADERS = {
+    "DS3231": _load_ds3231,
+    "LCD_I2C": _load_i2c_lcd,
+    "GPIO_Pin": lambda: Pin, 
+    "ADC_Pin": lambda: ADC,   
 }
+_DRIVER_CLASS_MAP = {} # Resolved loaders, filled by _get_driver_class
+
+def _get_driver_class(driver_name: str):
+    cls = _DRIVER_CLASS_MAP.get(driver_name)
+    if cls is None:
+        loader = _DRIVER_LOADERS.get(driver_name)
+        if loader is None: return None
+        cls = _DRIVER_CLASS_MAP[driver_name] = loader()
+    return cls
+
+# Config string -> machine constant, resolved once at import. Config values are upper-cased once per device init
+# ("in" == "IN"); an unknown key fails the device init instead of silently picking a default.
+_PIN_MODE = {'IN': Pin.IN, 'OUT': Pin.OUT}
+_PIN_PULL = {n: getattr(Pin, n) for n in ('PULL_UP', 'PULL_DOWN') if hasattr(Pin, n)}
+_ADC_ATTEN = {n: getattr(ADC, n) for n in ('ATTN_0DB', 'ATTN_2_5DB', 'ATTN_6DB', 'ATTN_11DB') if hasattr(ADC, n)}
+
+# Fixed error strings for execute_action's fast-failure paths: interned once instead of a fresh f-string per miss.
+# The descriptive text is only built when the logger will actually print it.
+_ERR_NOT_CONFIGURED = "device not configured"
+_ERR_NOT_READY = "device not ready"
+_ERR_NO_INSTANCE = "no instance"
+
+_I2C_DRIVERS = ("DS3231", "LCD_I2C")
+
+def _bus_resource_key(config: dict) -> str | None:
+    """Shared bus primitive key a device will use (e.g. 'i2c_1'), or None for pin-level drivers."""
+    if config.get("driver") in _I2C_DRIVERS and config.get("bus_type") == "i2c": return f"i2c_{config.get('bus_id', '1')}"
+    return None
+
+# --- Per-driver initializers: (hwm, name, config, driver_class, bus_locked) -> (instance, bus_resource_key) ---
+async def _init_i2c(hwm, name: str, config: dict, driver_class, bus_locked: bool, create):
+    bus_type = config.get("bus_type"); bus_id_str = str(config.get("bus_id", "1"))
+    if bus_type != "i2c": raise ValueError(f"'{name}' expects 'i2c', got '{bus_type}'.")
+    bus_resource_key = f"i2c_{bus_id_str}"
+    bus_obj = hwm.hw_primitives.get(bus_resource_key)
+    if not bus_obj: raise ValueError(f"I2C primitive '{bus_resource_key}' for '{name}' not found.")
+    address = config.get("address"); 
+    if address is None: raise ValueError(f"Missing 'address' for I2C dev '{name}'.")
+
+    if bus_locked: # Caller (_initialize_bus_group) already holds the bus lock
+        return create(hwm, name, driver_class, bus_obj, address, config), bus_resource_key
+    async with hwm._get_bus_lock(bus_resource_key): # type: ignore
+        if hwm.log.debug_enabled: hwm.log.debug(f"I2C lock acquired for initializing '{name}'.")
+        instance = create(hwm, name, driver_class, bus_obj, address, config)
+    if hwm.log.debug_enabled: hwm.log.debug(f"I2C lock released for '{name}'.")
+    return instance, bus_resource_key
+
+def _create_ds3231(hwm, name, driver_class, bus_obj, address, config):
+    instance = driver_class(bus_obj, address)
+    _ = instance.datetime() # Life-check
+    if hwm.log.debug_enabled: hwm.log.debug(f"DS3231 '{name}' life-check OK.")
+    return instance
+
+def _create_lcd(hwm, name, driver_class, bus_obj, address, config):
+    instance = driver_class(bus_obj, address, config['rows'], config['cols'])
+    instance.clear() # Life-check (clear implicitly tests basic communication)
+    if hwm.log.debug_enabled: hwm.log.debug(f"LCD_I2C '{name}' instance created & cleared.")
+    return instance
+
+async def _init_ds3231(hwm, name, config, driver_class, bus_locked):
+    return await _init_i2c(hwm, name, config, driver_class, bus_locked, _create_ds3231)
+
+async def _init_lcd(hwm, name, config, driver_class, bus_locked):
+    return await _init_i2c(hwm, name, config, driver_class, bus_locked, _create_lcd)
+
+async def _init_gpio(hwm, name, config, driver_class, bus_locked): # Synchronous init
+    pin_num = config["pin"]; pin_key = f"gpio_{pin_num}"
+    pin_obj = hwm.hw_primitives.get(pin_key) or Pin(pin_num)
+    hwm.hw_primitives[pin_key] = pin_obj # Ensure it's stored
+    mode_str=str(config.get('mode','IN')).upper(); pull_str=config.get('pull'); init_val=config.get('initial_value')
+    pin_mode = _PIN_MODE.get(mode_str)
+    if pin_mode is None: raise ValueError(f"Unknown pin mode '{mode_str}' for '{name}'.") # Never guess OUT for a wired input
+    pull_val = None
+    if pull_str:
+        pull_val = _PIN_PULL.get(str(pull_str).upper())
+        if pull_val is None: raise ValueError(f"Unknown pull '{pull_str}' for '{name}'.")
+    pin_obj.init(mode=pin_mode, value=init_val if pin_mode == Pin.OUT and init_val is not None else None, pull=pull_val)
+    if hwm.log.debug_enabled: hwm.log.debug(f"GPIO_Pin '{name}' (Pin {pin_num}) configured.")
+    return pin_obj, None
+
+async def _init_adc(hwm, name, config, driver_class, bus_locked): # Synchronous init
+    pin_num = config["pin"]; adc_key = f"adc_{pin_num}"
+    adc_obj = hwm.hw_primitives.get(adc_key) or ADC(Pin(pin_num))
+    hwm.hw_primitives[adc_key] = adc_obj
+    atten_str=config.get('attenuation'); atten_val=_ADC_ATTEN.get(str(atten_str or 'ATTN_11DB').upper())
+    if atten_val is not None: adc_obj.atten(atten_val)
+    elif atten_str: raise ValueError(f"Unknown attenuation '{atten_str}' for '{name}'.") # Default alone may be absent on the port
+    _ = adc_obj.read_u16() # Life-check
+    if hwm.log.debug_enabled: hwm.log.debug(f"ADC_Pin '{name}' (Pin {pin_num}) configured.")
+    return adc_obj, None
+
+_INIT_DISPATCH = {"DS3231": _init_ds3231, "LCD_I2C": _init_lcd, "GPIO_Pin": _init_gpio, "ADC_Pin": _init_adc}
 
 class HardwareManager:
     def __init__(self, logger, hw_primitives: dict, hw_config: dict, os_instance):
@@ -19,183 +118,212 @@ class HardwareManager:
         self.os = os_instance 
         self.hw_primitives = hw_primitives
         self.device_config_all = hw_config.get('devices', {}) 
+        self.verbose_errors = bool(hw_config.get('verbose_errors', False)) # Tracebacks from execute_action (costly under persistent HW faults)
         
-        self.drivers = {} 
-        self.bus_locks = {} 
+        # Driver table as parallel lists indexed by device id (struct-of-arrays): execute_action does one
+        # dict hash (_name_to_id) and then plain list indexing instead of a dict-of-dicts walk.
+        self._name_to_id = {}; self._names = []; self._config = []; self._state = []
+        self._instance = []; self._lock_key = []; self._bus_lock = []; self._methods = []
+        self._driver_type = []; self._driver_class = [] # Resolved once per initialize_all_drivers pass
+        self._status_cache = {} # name -> state name, kept in step with _state by _set_state (copy-on-write, see there)
+        self.bus_locks = {} # One lock per shared bus, all allocated here so init/actions never allocate one mid-loop
+        for config in self.device_config_all.values():
+            bus_key = _bus_resource_key(config)
+            if bus_key and bus_key not in self.bus_locks: self.bus_locks[bus_key] = asyncio.Lock()
         self._delegated_resources = {}
+        self._any_delegated = False # Fast-path flag: execute_action skips the delegation check while nothing is delegated
 
     def _get_bus_lock(self, resource_name: str) -> asyncio.Lock | None:
-        if not resource_name: return None 
-        lock_key = f"{resource_name}_bus_lock" 
-        if lock_key not in self.bus_locks:
-            self.log.debug(f"Creating bus lock for '{resource_name}' as '{lock_key}'")
-            self.bus_locks[lock_key] = asyncio.Lock()
-        return self.bus_locks[lock_key]
+        return self.bus_locks.get(resource_name) if resource_name else None # Keyed by the bus resource itself (e.g. 'i2c_1')
     
+    def _set_state(self, i: int, state: int):
+        # Copy-on-write: a map already handed out by get_drivers_status (e.g. inside a sent STATUS_REPORT) never changes
+        self._state[i] = state; cache = dict(self._status_cache); cache[self._names[i]] = DEVICE_STATE_NAMES[state]
+        self._status_cache = cache
+
+    def has_device(self, name: str) -> bool: return name in self._name_to_id
+
+    def get_device_state(self, name: str):
+        i = self._name_to_id.get(name)
+        return None if i is None else self._state[i]
+
+    def get_device_instance(self, name: str):
+        i = self._name_to_id.get(name)
+        return None if i is None else self._instance[i]
+
     async def initialize_all_drivers(self):
         self.log.info("Starting asynchronous driver initialization...")
-        init_tasks = []
-        for name, config in self.device_config_all.items():
-            self.drivers[name] = {
-                'instance': None, 'lock_key': None, 
-                'state': DeviceState.UNINITIALIZED, 'config': config.copy()
-            }
-            init_tasks.append(self._initialize_single_driver(name))
+        n = len(self.device_config_all)
+        self._name_to_id = {name: i for i, name in enumerate(self.device_config_all)}
+        # Device configs are held by reference: hw_config['devices'] is read-only once handed to HardwareManager.
+        self._names = list(self.device_config_all); self._config = list(self.device_config_all.values())
+        self._state = [DeviceState.UNINITIALIZED] * n; self._instance = [None] * n
+        self._lock_key = [None] * n; self._bus_lock = [None] * n; self._methods = [None] * n
+        uninit = DEVICE_STATE_NAMES[DeviceState.UNINITIALIZED]
+        self._status_cache = {name: uninit for name in self._names} # New map: earlier snapshots stay as they were
+        self._driver_type = [config.get("driver") for config in self._config]; self._driver_class = [None] * n
+        bus_groups = {} # bus resource key (None = no shared bus) -> [device names]
+        for i, name in enumerate(self._names):
+            driver_type = self._driver_type[i]
+            try: driver_class = _get_driver_class(driver_type) if driver_type in _INIT_DISPATCH else None # May import the driver module
+            except Exception as e: self.log.error(f"Loading driver '{driver_type}' for '{name}' failed: {e}"); driver_class = None
+            if driver_class is None: # Fail fast: never schedule an init coroutine for an unusable config
+                self.log.error(f"Unknown driver type '{driver_type}' for '{name}'."); self._set_state(i, DeviceState.FAILED); continue
+            self._driver_class[i] = driver_class
+            bus_groups.setdefault(_bus_resource_key(self._config[i]), []).append(name)
+
+        # Devices without a shared bus init concurrently; same-bus devices run back to back under one lock hold.
+        group_names = []; init_tasks = []
+        for bus_key, names in bus_groups.items():
+            if bus_key is None:
+                for name in names: group_names.append([name]); init_tasks.append(self._initialize_single_driver(name))
+            else:
+                group_names.append(names); init_tasks.append(self._initialize_bus_group(bus_key, names))
         
         results = await asyncio.gather(*init_tasks, return_exceptions=True)
         
-        for i, name_key in enumerate(self.device_config_all.keys()): # Ensure correct mapping if dict order changes
-            if isinstance(results[i], Exception):
-                self.log.error(f"Exception during initialization of driver '{name_key}': {results[i]}")
-                if self.drivers[name_key]['state'] != DeviceState.FAILED:
-                     self.drivers[name_key]['state'] = DeviceState.FAILED
+        for names, res in zip(group_names, results):
+            if isinstance(res, Exception):
+                for name_key in names:
+                    self.log.error(f"Exception during initialization of driver '{name_key}': {res}")
+                    i = self._name_to_id[name_key]
+                    if self._state[i] != DeviceState.READY: self._set_state(i, DeviceState.FAILED)
         self.log.info("Asynchronous driver initialization process completed.")
 
+    async def _initialize_bus_group(self, bus_key: str, names: list):
+        async with self._get_bus_lock(bus_key): # type: ignore
+            if self.log.debug_enabled: self.log.debug(f"Bus lock '{bus_key}' held for initializing {names}.")
+            for name in names: await self._initialize_single_driver(name, bus_locked=True)
+        if self.log.debug_enabled: self.log.debug(f"Bus lock '{bus_key}' released.")
+
     def log_driver_states(self):
-        self.log.info("Current driver states:")
-        if not self.drivers: self.log.info("  No drivers configured."); return
-        for name, data in self.drivers.items():
-            self.log.info(f"  - {name}: {data.get('state', 'UNKNOWN_STATE')}")
-
-    async def _initialize_single_driver(self, name: str):
-        driver_entry = self.drivers[name]
-        if driver_entry['state'] != DeviceState.UNINITIALIZED:
-            self.log.warn(f"Driver '{name}' not UNINITIALIZED ({driver_entry['state']}). Skipping.")
+        if not self._names: self.log.info("Current driver states:\n  No drivers configured."); return
+        self.log.info("\n".join(["Current driver states:"] + [f"  - {name}: {DEVICE_STATE_NAMES[state]}" for name, state in zip(self._names, self._state)]))
+
+    async def _initialize_single_driver(self, name: str, bus_locked: bool = False):
+        i = self._name_to_id[name]
+        if self._state[i] != DeviceState.UNINITIALIZED:
+            self.log.warn(f"Driver '{name}' not UNINITIALIZED ({DEVICE_STATE_NAMES[self._state[i]]}). Skipping.")
             return
 
-        driver_entry['state'] = DeviceState.INITIALIZING
-        config = driver_entry['config']
-        driver_name_from_config = config.get("driver")
-        driver_class = DRIVER_CLASS_MAP.get(driver_name_from_config)
+        self._set_state(i, DeviceState.INITIALIZING)
+        driver_name_from_config = self._driver_type[i]
         self.log.info(f"Initializing driver '{name}' (Type: {driver_name_from_config})...")
 
-        if not driver_class:
-            self.log.error(f"Unknown driver type '{driver_name_from_config}' for '{name}'.")
-            driver_entry['state'] = DeviceState.FAILED; return
-
-        instance = None; bus_resource_key = None
         try:
-            if driver_name_from_config in ["DS3231", "LCD_I2C"]:
-                bus_type = config.get("bus_type"); bus_id_str = str(config.get("bus_id", "1"))
-                if bus_type != "i2c": raise ValueError(f"'{name}' expects 'i2c', got '{bus_type}'.")
-                bus_resource_key = f"i2c_{bus_id_str}"
-                bus_obj = self.hw_primitives.get(bus_resource_key)
-                if not bus_obj: raise ValueError(f"I2C primitive '{bus_resource_key}' for '{name}' not found.")
-                address = config.get("address"); 
-                if address is None: raise ValueError(f"Missing 'address' for I2C dev '{name}'.")
-
-                i2c_lock = self._get_bus_lock(bus_resource_key)
-                async with i2c_lock: # type: ignore
-                    self.log.debug(f"I2C lock acquired for initializing '{name}'.")
-                    if driver_name_from_config == "DS3231":
-                        instance = driver_class(bus_obj, address)
-                        _ = instance.datetime() # Life-check
-                        self.log.debug(f"DS3231 '{name}' life-check OK.")
-                    elif driver_name_from_config == "LCD_I2C":
-                        instance = driver_class(bus_obj, address, config['rows'], config['cols'])
-                        instance.clear() # Life-check (clear implicitly tests basic communication)
-                        self.log.debug(f"LCD_I2C '{name}' instance created & cleared.")
-                self.log.debug(f"I2C lock released for '{name}'.")
-
-            elif driver_name_from_config == "GPIO_Pin": # Synchronous init
-                pin_num = config["pin"]; pin_key = f"gpio_{pin_num}"
-                pin_obj = self.hw_primitives.get(pin_key) or Pin(pin_num)
-                self.hw_primitives[pin_key] = pin_obj # Ensure it's stored
-                mode_str=config.get('mode','IN').upper(); pull_str=config.get('pull'); init_val=config.get('initial_value')
-                pin_mode = Pin.IN if mode_str == "IN" else Pin.OUT
-                pull_val = getattr(Pin, pull_str.upper(), None) if pull_str else None
-                pin_obj.init(mode=pin_mode, value=init_val if pin_mode == Pin.OUT and init_val is not None else None, pull=pull_val)
-                instance = pin_obj
-                self.log.debug(f"GPIO_Pin '{name}' (Pin {pin_num}) configured.")
-
-            elif driver_name_from_config == "ADC_Pin": # Synchronous init
-                pin_num = config["pin"]; adc_key = f"adc_{pin_num}"
-                adc_obj = self.hw_primitives.get(adc_key) or ADC(Pin(pin_num))
-                self.hw_primitives[adc_key] = adc_obj
-                atten_str=config.get('attenuation','ATTN_11DB'); atten_val=getattr(ADC,atten_str.upper(),None)
-                if atten_val: adc_obj.atten(atten_val)
-                _ = adc_obj.read_u16() # Life-check
-                instance = adc_obj
-                self.log.debug(f"ADC_Pin '{name}' (Pin {pin_num}) configured.")
-            
-            else: raise ValueError(f"Driver '{driver_name_from_config}' has no specific init logic.")
+            init_fn = _INIT_DISPATCH[driver_name_from_config] # Type validated in initialize_all_drivers
+            instance, bus_resource_key = await init_fn(self, name, self._config[i], self._driver_class[i], bus_locked)
 
-            driver_entry.update({'instance': instance, 'lock_key': bus_resource_key, 'state': DeviceState.READY})
+            self._instance[i] = instance; self._lock_key[i] = bus_resource_key
+            self._bus_lock[i] = self._get_bus_lock(bus_resource_key); self._methods[i] = {}
+            self._set_state(i, DeviceState.READY)
             self.log.info(f"Driver '{name}' (Type: {driver_name_from_config}) initialized successfully. State: READY.")
         except Exception as e:
             self.log.error(f"FAILED to initialize driver '{name}': {e}")
             sys.print_exception(e)
-            driver_entry['state'] = DeviceState.FAILED
-
-    async def execute_action(self, device_name: str, method_name: str, args: tuple, kwargs: dict, requester_service: str = None) -> dict:
-        response = {'request_ok': False, 'value': None} 
-        driver_entry = self.drivers.get(device_name)
-
-        if not driver_entry:
-            response['error'] = f"Device '{device_name}' not configured."
-            self.log.error(response['error']); return response
-        if driver_entry['state'] != DeviceState.READY:
-            response['error'] = f"Device '{device_name}' not READY. State: {driver_entry['state']}."
-            self.log.warn(response['error'] + f" (Req: {method_name} by {requester_service})"); return response
-        instance = driver_entry['instance']
+            self._set_state(i, DeviceState.FAILED)
+
+    async def execute_action(self, device_name: str, method_name: str, args: tuple, kwargs: dict, requester_service: str = None) -> tuple:
+        """Runs instance.method(*args, **kwargs) for a READY device. Returns (ok, value, error_str)."""
+        i = self._name_to_id.get(device_name)
+
+        if i is None:
+            if self.log.error_enabled: self.log.error(f"Device '{device_name}' not configured.")
+            return (False, None, _ERR_NOT_CONFIGURED)
+        state = self._state[i]
+        if state != DeviceState.READY:
+            if self.log.warn_enabled:
+                self.log.warn(f"Device '{device_name}' not READY. State: {DEVICE_STATE_NAMES[state]}. (Req: {method_name} by {requester_service})")
+            return (False, None, _ERR_NOT_READY)
+        instance = self._instance[i]
         if instance is None:
-            response['error'] = f"No instance for READY device '{device_name}'."; self.log.error(response['error'])
-            driver_entry['state'] = DeviceState.FAILED; return response
+            if self.log.error_enabled: self.log.error(f"No instance for READY device '{device_name}'.")
+            self._set_state(i, DeviceState.FAILED); return (False, None, _ERR_NO_INSTANCE)
 
-        bus_resource_key = driver_entry.get('lock_key')
-        if bus_resource_key and requester_service: # Delegation Check
+        bus_resource_key = self._lock_key[i]
+        asyncio_bus_lock = self._bus_lock[i] # Resolved once at init; None for pin-level drivers
+        if self._any_delegated and bus_resource_key is not None and requester_service: # Delegation Check (GPIO/ADC skip it entirely)
             owner = self._delegated_resources.get(bus_resource_key)
             if owner and owner != requester_service:
-                response['error'] = f"Resource '{bus_resource_key}' for '{device_name}' delegated to '{owner}'. Denied for '{requester_service}'."
-                self.log.warn(response['error']); return response
-        
-        asyncio_bus_lock = self._get_bus_lock(bus_resource_key)
-        try: method_to_call = getattr(instance, method_name)
-        except AttributeError:
-            response['error'] = f"Method '{method_name}' not found on '{device_name}' ({type(instance).__name__})."
-            self.log.error(response['error']); return response
+                err = f"Resource '{bus_resource_key}' for '{device_name}' delegated to '{owner}'. Denied for '{requester_service}'."
+                self.log.warn(err); return (False, None, err)
+        methods_cache = self._methods[i] # Bound methods, filled lazily on first use
+        method_to_call = methods_cache.get(method_name)
+        if method_to_call is None:
+            method_to_call = getattr(instance, method_name, None)
+            if method_to_call is None:
+                err = f"Method '{method_name}' not found on '{device_name}'."
+                if self.log.error_enabled: self.log.error(f"{err} ({type(instance).__name__})")
+                return (False, None, err)
+            methods_cache[method_name] = method_to_call
         
         # self.log.debug(f"HWMAN Call: {device_name}.{method_name}, Lock: {bool(asyncio_bus_lock)}")
         try:
-            if asyncio_bus_lock:
+            # 'args' holds the unpacked arguments: move_to(col,row) -> (col,row), putstr(text) -> (text,).
+            # Shape-specialized calls: read_u16()/value(x)/move_to(c,r)/write_at(c,r,s) skip the *args/**kwargs unpack.
+            n_args = len(args) if args else 0
+            if asyncio_bus_lock is not None:
                 async with asyncio_bus_lock:
-                    # Ensure args are passed correctly; method_to_call expects them unpacked.
-                    # The 'args' tuple itself should contain the individual arguments.
-                    # e.g., for move_to(col,row), args should be (col,row)
-                    # for putstr(text), args should be (text,)
-                    # for datetime(dt_tuple), args should be (dt_tuple,)
-                    result = method_to_call(*args, **kwargs) if (args or kwargs) else method_to_call()
+                    if kwargs: result = method_to_call(*args, **kwargs)
+                    elif n_args == 0: result = method_to_call()
+                    elif n_args == 1: result = method_to_call(args[0])
+                    elif n_args == 2: result = method_to_call(args[0], args[1])
+                    elif n_args == 3: result = method_to_call(args[0], args[1], args[2])
+                    else: result = method_to_call(*args)
             else: 
-                result = method_to_call(*args, **kwargs) if (args or kwargs) else method_to_call()
-            
-            response['value'] = result; response['request_ok'] = True
+                if kwargs: result = method_to_call(*args, **kwargs)
+                elif n_args == 0: result = method_to_call()
+                elif n_args == 1: result = method_to_call(args[0])
+                elif n_args == 2: result = method_to_call(args[0], args[1])
+                elif n_args == 3: result = method_to_call(args[0], args[1], args[2])
+                else: result = method_to_call(*args)
             # self.log.debug(f"Call to {device_name}.{method_name} OK. Result type: {type(result)}")
+            return (True, result, None)
         except TypeError as te: # Usually indicates wrong number/type of arguments to method_to_call
-            response['error'] = f"TypeError calling {device_name}.{method_name} with args={args}, kwargs={kwargs}: {te}"
-            self.log.error(response['error']); sys.print_exception(te) #! Print stack for TypeError
+            err = f"TypeError calling {device_name}.{method_name} with args={args}, kwargs={kwargs}: {te}"
+            self.log.error(err)
+            if self.verbose_errors: sys.print_exception(te) #! Print stack for TypeError
         except Exception as e:
-            response['error'] = f"Exception during {device_name}.{method_name}: {type(e).__name__}: {e}"
-            self.log.error(response['error']); sys.print_exception(e)
-        
-        # self.log.debug(f"execute_action for {device_name}.{method_name} response: OK={response.get('request_ok')}, Val={str(response.get('value'))[:30]}")
-        return response
+            err = f"Exception during {device_name}.{method_name}: {type(e).__name__}: {e}"
+            self.log.error(err)
+            if self.verbose_errors: sys.print_exception(e)
+        return (False, None, err)
     
+    async def _execute_locked_batch(self, device_name: str, calls: list) -> int:
+        """Runs [(method_name, args), ...] on one READY device under a single bus-lock hold. Returns calls that succeeded."""
+        i = self._name_to_id.get(device_name)
+        if i is None or self._state[i] != DeviceState.READY or self._instance[i] is None:
+            self.log.warn(f"Batch on '{device_name}' skipped: device not READY."); return 0
+        owner = self._delegated_resources.get(self._lock_key[i]) if self._any_delegated and self._lock_key[i] is not None else None
+        if owner: self.log.warn(f"Batch on '{device_name}' skipped: resource delegated to '{owner}'."); return 0
+        instance = self._instance[i]; lock = self._bus_lock[i]; done = 0
+        if lock is not None: await lock.acquire()
+        try:
+            for method_name, args in calls:
+                try: getattr(instance, method_name)(*args); done += 1
+                except Exception as e: self.log.error(f"Error during {device_name}.{method_name}: {e}")
+        finally:
+            if lock is not None: lock.release()
+        return done
+
     async def handle_delegation_request(self, action: str, resource_key: str, requester_service: str) -> dict:
         response = {'request_ok': False, 'error': 'Not fully implemented for delegation'}
         self.log.warn("handle_delegation_request called but not fully implemented for this refactor pass.")
+        self._any_delegated = bool(self._delegated_resources) # Keep in sync with any change to _delegated_resources
         return response
 
     def get_drivers_status(self) -> dict:
-        return {name: data.get('state', DeviceState.UNINITIALIZED) for name, data in self.drivers.items()}
+        """Snapshot name -> state-name map: state changes replace it, never mutate it. Read-only: copy it before mutating."""
+        return self._status_cache
 
     async def cleanup_all_drivers(self):
         self.log.info("Cleaning up all managed drivers...")
         # ... (implementation from previous response seems okay)
         # Ensure execute_action is called correctly for cleanup methods
         cleanup_actions_taken = 0
-        for name, driver_info in self.drivers.items():
-            if not driver_info.get('instance'): continue
-            instance = driver_info['instance']; driver_type_name = type(instance).__name__ 
+        for name, instance in zip(self._names, self._instance):
+            if not instance: continue
+            driver_type_name = type(instance).__name__ 
             cleanup_method_name = None; cleanup_args = ()
             
             if driver_type_name == "Pin" and hasattr(instance, 'mode') and instance.mode() == Pin.OUT:
@@ -203,9 +331,7 @@ class HardwareManager:
             elif driver_type_name == "DS3231" and hasattr(instance, 'no_interrupt'):
                 cleanup_method_name = 'no_interrupt'
             elif driver_type_name == "I2cLcd":
-                await self.execute_action(name, 'clear', (), {}, requester_service='os_shutdown')
-                await self.execute_action(name, 'backlight_off', (), {}, requester_service='os_shutdown')
-                cleanup_actions_taken +=2; continue 
+                cleanup_actions_taken += await self._execute_locked_batch(name, [('clear', ()), ('backlight_off', ())]); continue 
             if cleanup_method_name:
                 try:
                     await self.execute_action(name, cleanup_method_name, cleanup_args, {}, requester_service='os_shutdown')
@@ -0,0 +1,43 @@
+import asyncio
+from .message import Message
+from lib.queue import QueueFull
+
+class RingInbox:
+    #! Fixed ring of Message slots allocated once per service: post() fills the next free slot in place,
+    #! so queueing a message allocates nothing. Single consumer (Service._message_processor): get() returns the
+    #! head slot and it stays reserved until task_done(); on_message must not keep msg after it returns.
+    __slots__ = ('_slots', '_size', '_head', '_count', '_evput')
+
+    def __init__(self, size: int):
+        self._size = size = max(1, int(size))
+        self._slots = [Message(None, None, None, None) for _ in range(size)]
+        self._head = 0; self._count = 0
+        self._evput = asyncio.Event() # Set by post(), waited on by get() when the ring is empty
+
+    def full(self): return self._count >= self._size
+    def empty(self): return self._count == 0
+    def qsize(self): return self._count
+
+    def post(self, sender, recipient, msg_type, payload):
+        count = self._count
+        if count >= self._size: raise QueueFull()
+        i = self._head + count
+        if i >= self._size: i -= self._size
+        m = self._slots[i]
+        m.sender = sender; m.recipient = recipient; m.type = msg_type; m.payload = payload; m._ts = None
+        self._count = count + 1; self._evput.set()
+
+    def put_nowait(self, msg: Message): # Compatibility: copies the fields of an existing Message into a slot
+        self.post(msg.sender, msg.recipient, msg.type, msg.payload)
+
+    async def get(self) -> Message:
+        while self._count == 0:
+            self._evput.clear(); await self._evput.wait()
+        return self._slots[self._head]
+
+    def task_done(self): # Releases the slot returned by the last get()
+        if self._count == 0: return
+        m = self._slots[self._head]; m.payload = None # Drop the payload reference so it can be collected
+        head = self._head + 1
+        self._head = 0 if head >= self._size else head
+        self._count -= 1
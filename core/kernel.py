@@ -1,8 +1,10 @@
 import sys
 import time
+import errno
 import asyncio
-import ujson
-from machine import I2C, UART, Pin, ADC, RTC as MachineRTC, wake_reason 
+from ujson import loads as _ujson_loads # Legacy storage.json fallback only
+import machine
+from machine import RTC as MachineRTC, wake_reason 
 
 from .message import Message
 from .service import Service
@@ -11,28 +13,50 @@ from .constants import (
     DeviceState, OS_MSG_TYPE_HW_ACTION, OS_MSG_TYPE_HW_ACTION_RESPONSE,
     OS_MSG_TYPE_HW_RESOURCE_LOCK_REQUEST, OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE,
     OS_MSG_TYPE_OS_COMMAND, OS_MSG_TYPE_SERVICE_COMMAND, OS_MSG_TYPE_STATUS_REPORT,
-    OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_UPDATE, #! Added STORAGE_UPDATE
+    OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_UPDATE, OS_MSG_TYPE_STORAGE_DIRTY, #! Added STORAGE_UPDATE
     OS_CMD_CREATE_SERVICE, OS_CMD_STOP_SERVICE, OS_CMD_PAUSE_SERVICE, OS_CMD_RESUME_SERVICE,
     OS_CMD_SHUTDOWN, OS_CMD_SAVE_STORAGE, OS_CMD_GET_STATUS, OS_CMD_REINIT_HW_MANAGER,
     SVC_CMD_SHOW_BOOT_STATUS #! Added for specific service command
 )
 
 from lib.queue import QueueFull 
+from lib.ubjson import loads as _ubjson_loads, dump as _ubjson_dump, dumps as _ubjson_dumps
 import lib.urtc as urtc_module 
 
 from utils import get_logger
-from env import HARDWARE_CONFIGURATION, SERVICE_REGISTRY, STORAGE_REGISTRY
+from env import HARDWARE_CONFIGURATION, HW_PRIMITIVES_PLAN, SERVICE_REGISTRY, STORAGE_REGISTRY
+
+def _wake_source_names():
+    # machine.wake_reason() code -> tuple of names usable in SERVICE_REGISTRY 'wake_sources' (codes missing on this port
+    # are left out). Codes can alias: on ESP32 PIN_WAKE == EXT0_WAKE, so a pin wake matches both 'pin' and 'ext0'.
+    names = {}
+    for c, n in (('PIN_WAKE', 'pin'), ('EXT0_WAKE', 'ext0'), ('EXT1_WAKE', 'ext1'),
+                 ('TIMER_WAKE', 'timer'), ('TOUCHPAD_WAKE', 'touchpad'), ('ULP_WAKE', 'ulp')):
+        if hasattr(machine, c): code = getattr(machine, c); names[code] = names.get(code, ()) + (n,)
+    return names
+_WAKE_SOURCE_NAMES = _wake_source_names()
+_HW_MSG_TYPES = frozenset((OS_MSG_TYPE_HW_ACTION, OS_MSG_TYPE_HW_RESOURCE_LOCK_REQUEST)) # Need the HardwareManager
 
 class MicroOS:
     def __init__(self, storage_path='/data/storage.json'):
         self.storage_path = storage_path
         self.storage = {} 
         self._storage_dirty = False 
+        self._pending_changed_keys = set(); self._dirty_broadcast_pending = False # STORAGE_UPDATE coalescing
+        self.flush_interval_ms = 300000; self._flusher_task = None; self._saving = False # Fallback write-back (see run())
         self.hw_config_full = HARDWARE_CONFIGURATION
         self.svc_reg = SERVICE_REGISTRY 
         self.loop = asyncio.get_event_loop()
         self.loop.set_exception_handler(self._handle_exception)
+        self._create_task = self.loop.create_task # Bound once: used on every message routed to 'os'
+        self._os_cmd_dispatch = { # OS_CMD_* action -> handler(msg, target_name, params)
+            OS_CMD_CREATE_SERVICE: self._cmd_create, OS_CMD_STOP_SERVICE: self._cmd_stop,
+            OS_CMD_PAUSE_SERVICE: self._cmd_pause, OS_CMD_RESUME_SERVICE: self._cmd_resume,
+            OS_CMD_SHUTDOWN: self._cmd_shutdown, OS_CMD_SAVE_STORAGE: self._cmd_save_storage,
+            OS_CMD_GET_STATUS: self._cmd_get_status, OS_CMD_REINIT_HW_MANAGER: self._cmd_reinit_hw }
+        self._sync_os_cmd_dispatch = {OS_CMD_GET_STATUS: self._send_status_report} # Never await: run inline from send_message
         self.services = {} 
+        self._stop_tiers = [] # [(start_order, [names])], highest start_order first: shutdown stops tier by tier
         self._shutdown_event = asyncio.Event()
         self._is_running = False 
         self.hardware_primitives = {}
@@ -40,84 +64,111 @@ class MicroOS:
         self.system_rtc = MachineRTC() 
         self.urtc_lib = urtc_module 
         self.wake_reason_code = wake_reason()
+        self.wake_sources = _WAKE_SOURCE_NAMES.get(self.wake_reason_code, ()) # (): cold boot (power-on/reset)
         self.log = get_logger("MicroOS")
         self._load_storage()
+        self._storage_dir_ok = self._ensure_storage_dir() # Checked once; saves only retry it if the open fails
 
     @property
     def is_running(self): return self._is_running and not self._shutdown_event.is_set()
 
     def _load_storage(self):
         try:
-            with open(self.storage_path, 'r') as f: loaded_data = ujson.load(f)
-            self.storage = STORAGE_REGISTRY.copy(); self.storage.update(loaded_data) 
+            with open(self.storage_path, 'rb') as f: raw = f.read()
+            try: loaded_data = _ubjson_loads(raw)
+            except ValueError: loaded_data = _ujson_loads(raw) # Legacy JSON text storage; rewritten as UBJSON on next save
+            self.storage = dict(STORAGE_REGISTRY); self.storage.update(loaded_data) # No {**a, **b}: MicroPython's grammar lacks it
             self.log.info(f"Storage loaded from {self.storage_path}")
         except Exception as e:
             self.log.warn(f"Load storage FAIL from {self.storage_path}: {e}. Using default.")
-            self.storage = STORAGE_REGISTRY.copy()
+            self.storage = dict(STORAGE_REGISTRY)
         self._storage_dirty = False 
 
+    def _ensure_storage_dir(self) -> bool:
+        # Ensure directory exists (MicroPython specific)
+        # This part is a bit hacky for general paths, adjust if needed
+        try:
+            import os; parts = self.storage_path.split('/')
+            if len(parts) > 1:
+                path_only = "/".join(parts[:-1])
+                # Attempt to stat, if it fails or not a dir, try to create
+                is_dir = False
+                try: is_dir = (os.stat(path_only)[0] & 0x4000) != 0 # S_IFDIR
+                except OSError: pass # Path doesn't exist
+                if not is_dir: os.mkdir(path_only)
+            return True
+        except Exception: return False
+
+    def _open_storage_file(self, path: str):
+        try: return open(path, 'wb')
+        except OSError as e:
+            if e.args[0] != errno.ENOENT: raise
+            self._storage_dir_ok = self._ensure_storage_dir() # Directory vanished since boot: recreate and retry once
+            return open(path, 'wb')
+
     def _save_storage(self):
         if not self._storage_dirty: self.log.debug("Storage clean, skip save."); return
         try:
-            # Ensure directory exists (MicroPython specific)
-            # This part is a bit hacky for general paths, adjust if needed
-            try:
-                import os; parts = self.storage_path.split('/')
-                if len(parts) > 1:
-                    path_only = "/".join(parts[:-1])
-                    # Attempt to stat, if it fails or not a dir, try to create
-                    is_dir = False
-                    try: is_dir = (os.stat(path_only)[0] & 0x4000) != 0 # S_IFDIR
-                    except OSError: pass # Path doesn't exist
-                    if not is_dir: os.mkdir(path_only)
-            except Exception: pass
-
-            with open(self.storage_path, 'w') as f: ujson.dump(self.storage, f)
+            with self._open_storage_file(self.storage_path) as f: _ubjson_dump(self.storage, f)
             self.log.info(f"Storage saved to {self.storage_path}")
             self._storage_dirty = False 
         except Exception as e:
             self.log.error(f"Save storage FAIL to {self.storage_path}: {e}"); sys.print_exception(e)
 
-    def mark_storage_dirty(self, changed_keys: list = None): #! Added changed_keys
-        if not self._storage_dirty: self.log.debug("Storage marked dirty.")
-        self._storage_dirty = True
-        # Broadcast that storage has been updated, with keys that changed
-        self.send_message('os', OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_UPDATE, {'changed_keys': changed_keys or []})
+    async def _save_storage_async(self, chunk_size: int = 512):
+        """Like _save_storage, but writes in chunks and yields between them so other coroutines keep running."""
+        if not self._storage_dirty or self._saving: return
+        self._saving = True
+        try:
+            data = _ubjson_dumps(self.storage); self._storage_dirty = False # Snapshot taken: later writes re-dirty it
+            tmp_path = self.storage_path + '.tmp'
+            with self._open_storage_file(tmp_path) as f:
+                for pos in range(0, len(data), chunk_size):
+                    f.write(data[pos:pos + chunk_size]); await asyncio.sleep_ms(0)
+            import os; os.rename(tmp_path, self.storage_path) # Swap in only once complete
+            self.log.info(f"Storage saved to {self.storage_path}")
+        except Exception as e:
+            self._storage_dirty = True
+            self.log.error(f"Save storage FAIL to {self.storage_path}: {e}"); sys.print_exception(e)
+        finally: self._saving = False
+
+    async def _storage_flusher(self):
+        try:
+            while self.is_running:
+                await asyncio.sleep_ms(self.flush_interval_ms)
+                if self._storage_dirty: await self._save_storage_async()
+        except asyncio.CancelledError: pass
+
+    def mark_storage_dirty(self, changed_keys: list = None, new_values: dict = None): #! Added changed_keys
+        # new_values: {key: value} to write into storage here; keys whose value is unchanged are skipped, and
+        # if nothing changed there is no dirty flag, broadcast or flush at all.
+        if new_values:
+            storage = self.storage; changed = []
+            for k, v in new_values.items():
+                if k not in storage or storage[k] != v: storage[k] = v; changed.append(k)
+            if not changed and not changed_keys: return
+            changed_keys = changed + list(changed_keys) if changed_keys else changed
+        if not self._storage_dirty: # Clean -> dirty: tell savers once; further writes until the next save send nothing
+            self.log.debug("Storage marked dirty."); self._storage_dirty = True
+            self._broadcast(Message('os', OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_DIRTY, None))
+        # Keys are accumulated and broadcast once per loop tick, so a burst of writes yields a single STORAGE_UPDATE
+        if changed_keys: self._pending_changed_keys.update(changed_keys)
+        if not self._dirty_broadcast_pending:
+            self._dirty_broadcast_pending = True; asyncio.create_task(self._flush_dirty_broadcast())
 
+    async def _flush_dirty_broadcast(self):
+        await asyncio.sleep_ms(0) # Let the rest of the current tick mark its keys too
+        keys = list(self._pending_changed_keys); self._pending_changed_keys.clear(); self._dirty_broadcast_pending = False
+        self._broadcast(Message('os', OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_UPDATE, {'changed_keys': keys}))
 
     def is_storage_dirty(self): return self._storage_dirty
 
     def _init_hardware_primitives(self):
-        self.log.info("Initializing hardware primitives...");
-        # ... (I2C, UART, GPIO/ADC placeholders - code from previous response unchanged, assumed OK)
-        i2c_configs = self.hw_config_full.get('i2c', {})
-        for bus_id_str, conf in i2c_configs.items():
-            try:
-                bus_id=int(bus_id_str); i2c_key=f"i2c_{bus_id}"; scl_p,sda_p=Pin(conf['scl']),Pin(conf['sda'])
-                freq=conf.get('freq',100000)
-                self.hardware_primitives[i2c_key]=I2C(bus_id,scl=scl_p,sda=sda_p,freq=freq)
-                self.log.info(f"Primitive I2C({bus_id}) SCL={conf['scl']},SDA={conf['sda']},F={freq}Hz OK.")
-            except Exception as e: self.log.error(f"I2C primitive {bus_id_str} init FAIL: {e}"); sys.print_exception(e)
-        uart_configs = self.hw_config_full.get('uart', {})
-        for bus_id_str, conf in uart_configs.items():
-            try:
-                bus_id=int(bus_id_str); uart_key=f"uart_{bus_id}"
-                self.hardware_primitives[uart_key]=UART(bus_id,baudrate=conf['baudrate'],tx=conf['tx'],rx=conf['rx'])
-                self.log.info(f"Primitive UART({bus_id}) TX={conf['tx']},RX={conf['rx']} OK.")
-            except Exception as e: self.log.error(f"UART primitive {bus_id_str} init FAIL: {e}"); sys.print_exception(e)
-        device_configs = self.hw_config_full.get('devices', {})
-        for name, conf in device_configs.items():
-            driver_name=conf.get("driver"); pin_num=conf.get("pin")
-            if pin_num is None: continue
-            try:
-                if driver_name=="GPIO_Pin": pin_key=f"gpio_{pin_num}"
-                elif driver_name=="ADC_Pin": pin_key=f"adc_{pin_num}"
-                else: continue
-                if pin_key not in self.hardware_primitives:
-                    if "gpio" in pin_key: self.hardware_primitives[pin_key]=Pin(pin_num)
-                    elif "adc" in pin_key: self.hardware_primitives[pin_key]=ADC(Pin(pin_num))
-                    self.log.debug(f"Primitive {driver_name}({pin_num}) placeholder for '{name}'.")
-            except Exception as e: self.log.error(f"Primitive Pin/ADC init FAIL for '{name}' on pin {pin_num}: {e}")
+        self.log.info("Initializing hardware primitives...")
+        for key,cls,args,kw in HW_PRIMITIVES_PLAN: # Precomputed in env.py from HARDWARE_CONFIGURATION
+            if key in self.hardware_primitives: continue
+            try: self.hardware_primitives[key]=cls(*args,**kw); self.log.info(f"Primitive '{key}' ({cls.__name__}) OK.")
+            except Exception as e: self.log.error(f"Primitive '{key}' init FAIL: {e}"); sys.print_exception(e)
         self.log.info("Hardware primitive initialization complete.")
 
 
@@ -162,38 +213,63 @@ class MicroOS:
             return False
         
     def send_message(self, sender: str, recipient: str, msg_type: str, payload: dict = None):
-        msg=Message(sender,recipient,msg_type,payload if payload is not None else {})
-        if recipient==OS_MSG_TYPE_BROADCAST: self._broadcast(msg); return
-        if recipient=='os': asyncio.create_task(self.handle_os_message(msg)); return
+        if payload is None: payload={}
+        if recipient==OS_MSG_TYPE_BROADCAST: self._broadcast(Message(sender,recipient,msg_type,payload)); return
+        if recipient=='os':
+            msg=Message(sender,recipient,msg_type,payload)
+            if msg_type==OS_MSG_TYPE_OS_COMMAND:
+                sync_handler=self._sync_os_cmd_dispatch.get(msg.payload.get('action'))
+                if sync_handler: sync_handler(msg); return # No Task needed for a purely synchronous command
+            self._create_task(self.handle_os_message(msg)); return
         
         target_svc = self.services.get(recipient)
-        if isinstance(target_svc, Service):
-            try: target_svc.inbox.put_nowait(msg)
-            except QueueFull: self.log.warn(f"Inbox full for '{recipient}'. Msg from '{sender}' (type:{msg_type}) dropped.")
+        if target_svc is not None: # self.services only ever holds Service instances (create_service)
+            inbox=target_svc.inbox
+            if inbox.full(): # Checked first so the common drop case doesn't raise QueueFull
+                self._warn_inbox_full(recipient,sender,msg_type); return
+            try: inbox.post(sender,recipient,msg_type,payload) # Fills a preallocated slot of the service's ring
+            except QueueFull: self._warn_inbox_full(recipient,sender,msg_type)
             except Exception as e: self.log.error(f"Err queueing msg for '{recipient}': {e}")
         else: self.log.warn(f"Unknown recipient '{recipient}'. Msg from '{sender}' (type:{msg_type}) dropped.")
 
+    def _warn_inbox_full(self, recipient: str, sender: str, msg_type, broadcast: bool = False):
+        if not self.log.warn_enabled: return # Dropped-message text is only built when WARN will print it
+        if broadcast: self.log.warn(f"Inbox full for '{recipient}' during broadcast from '{sender}'. Type '{msg_type}' dropped.")
+        else: self.log.warn(f"Inbox full for '{recipient}'. Msg from '{sender}' (type:{msg_type}) dropped.")
+
     def _broadcast(self, msg: Message):
         # self.log.debug(f"Broadcasting from '{msg.sender}': type={msg.type}, p_keys={list(msg.payload.keys())}")
-        for name,svc_instance in self.services.items():
-            if name!=msg.sender and isinstance(svc_instance,Service) and svc_instance.is_running:
-                broadcast_msg=Message(msg.sender,name,msg.type,msg.payload.copy() if msg.payload else {})
-                try: svc_instance.inbox.put_nowait(broadcast_msg)
-                except QueueFull: self.log.warn(f"Inbox full for '{name}' during broadcast from '{msg.sender}'. Type '{msg.type}' dropped.")
+        # Broadcast payloads are shared read-only by every recipient (no per-service copy); handlers that need to
+        # modify one must take their own dict(msg.payload).
+        services=self.services; n_svcs=len(services); sender=msg.sender
+        if n_svcs==0 or (n_svcs==1 and sender in services): return # No audience (early boot / late shutdown)
+        msg_type=msg.type; payload=msg.payload if msg.payload else {}
+        for name,svc_instance in tuple(services.items()): # Snapshot: a put can wake code that stops a service
+            if name!=sender and svc_instance.is_running:
+                subs=svc_instance._subscribed_types
+                if subs is not None and msg_type not in subs: continue # Not subscribed: no slot, no on_message hop
+                inbox=svc_instance.inbox
+                if inbox.full(): self._warn_inbox_full(name,sender,msg_type,True); continue
+                try: inbox.post(sender,name,msg_type,payload)
+                except QueueFull: self._warn_inbox_full(name,sender,msg_type,True)
                 except Exception as e: self.log.error(f"Failed to queue broadcast msg for '{name}': {e}")
 
     async def handle_os_message(self, msg: Message):
         # self.log.debug(f"OS Handling msg from '{msg.sender}': type={msg.type}, p_keys={list(msg.payload.keys())}")
-        if not self.hardware_manager and msg.type in [OS_MSG_TYPE_HW_ACTION, OS_MSG_TYPE_HW_RESOURCE_LOCK_REQUEST]:
+        if not self.hardware_manager and msg.type in _HW_MSG_TYPES:
             # ... (error response if HWM not ready - code from previous response unchanged)
             self.log.error("HWManager not ready for HW message."); return 
         if msg.type == OS_MSG_TYPE_HW_ACTION:
             req_id=msg.payload.get('request_id'); reply_to=msg.payload.get('reply_to')
             if req_id is None or reply_to is None: self.log.error(f"HW_ACTION from {msg.sender} missing req_id/reply_to."); return
-            hw_resp = await self.hardware_manager.execute_action( # type: ignore
+            ok, value, err = await self.hardware_manager.execute_action( # type: ignore
                 msg.payload.get('device'), msg.payload.get('method'),
                 tuple(msg.payload.get('args',[])), msg.payload.get('kwargs',{}), msg.sender )
-            hw_resp['request_id']=req_id; self.send_message('os',reply_to,OS_MSG_TYPE_HW_ACTION_RESPONSE,hw_resp)
+            hw_resp={'request_id':req_id,'request_ok':ok,'value':value}
+            if err: hw_resp['error']=err
+            reply_svc=self.services.get(reply_to)
+            if reply_svc is not None: reply_svc._deliver_hw_response(hw_resp) # Straight into the request slot, no Message/inbox
+            else: self.send_message('os',reply_to,OS_MSG_TYPE_HW_ACTION_RESPONSE,hw_resp) # Logs the unknown recipient
         elif msg.type == OS_MSG_TYPE_OS_COMMAND: await self._handle_os_level_command(msg)
         elif msg.type == OS_MSG_TYPE_SERVICE_COMMAND:
             target_name=msg.payload.get('target_service')
@@ -205,50 +281,69 @@ class MicroOS:
 
     async def _handle_os_level_command(self, msg: Message):
         action=msg.payload.get('action'); target_name=msg.payload.get('name'); params=msg.payload.get('params',{})
-        if action==OS_CMD_CREATE_SERVICE and target_name:
-            # ... (create service logic - code from previous response unchanged)
-            svc_info=self.svc_reg.get(target_name)
-            if svc_info:
-                svc_cls=svc_info.get('class')
-                if svc_cls and isinstance(svc_cls,type): asyncio.create_task(self.create_service(target_name,svc_cls,params))
-                else: self.log.error(f"Cmd '{OS_CMD_CREATE_SERVICE}': Invalid class for '{target_name}'.")
-            else: self.log.error(f"Cmd '{OS_CMD_CREATE_SERVICE}': Svc '{target_name}' not in registry.")
-        elif action==OS_CMD_STOP_SERVICE and target_name: asyncio.create_task(self.stop_service(target_name,params))
-        elif action==OS_CMD_PAUSE_SERVICE and target_name:
-            svc=self.services.get(target_name); 
-            if svc: await svc.pause()
-            else: self.log.warn(f"Cmd '{OS_CMD_PAUSE_SERVICE}': Svc '{target_name}' not found.")
-        elif action==OS_CMD_RESUME_SERVICE and target_name:
-            svc=self.services.get(target_name);
-            if svc: await svc.resume()
-            else: self.log.warn(f"Cmd '{OS_CMD_RESUME_SERVICE}': Svc '{target_name}' not found.")
-        elif action==OS_CMD_SHUTDOWN: await self.shutdown()
-        elif action==OS_CMD_SAVE_STORAGE: self._save_storage()
-        elif action==OS_CMD_GET_STATUS:
-            # ... (get status logic - code from previous response unchanged)
-            status_payload={'services':{},'hardware_devices':{},'storage_dirty':self.is_storage_dirty()}
-            for sn,si in self.services.items(): status_payload['services'][sn]={'r':si.is_running,'p':si.is_paused,'c':si.is_critical}
-            if self.hardware_manager:status_payload['hardware_devices']=self.hardware_manager.get_drivers_status()
-            self.send_message('os',msg.sender,OS_MSG_TYPE_STATUS_REPORT,status_payload)
-        elif action==OS_CMD_REINIT_HW_MANAGER:
-            self.log.warn("Re-initializing HW Manager and drivers...");
-            if self.hardware_manager: await self.hardware_manager.cleanup_all_drivers()
-            await self._initialize_hardware_drivers(); self.log.warn("HW re-init complete.")
+        handler=self._os_cmd_dispatch.get(action)
+        if handler: await handler(msg,target_name,params)
         else: self.log.warn(f"Unknown OS cmd action: '{action}' from {msg.sender}")
 
+    async def _cmd_create(self, msg: Message, target_name: str, params: dict):
+        if not target_name: self.log.warn(f"Cmd '{OS_CMD_CREATE_SERVICE}' from {msg.sender} missing 'name'."); return
+        svc_info=self.svc_reg.get(target_name)
+        if svc_info:
+            svc_cls=svc_info.get('class')
+            if svc_cls and isinstance(svc_cls,type): asyncio.create_task(self.create_service(target_name,svc_cls,params))
+            else: self.log.error(f"Cmd '{OS_CMD_CREATE_SERVICE}': Invalid class for '{target_name}'.")
+        else: self.log.error(f"Cmd '{OS_CMD_CREATE_SERVICE}': Svc '{target_name}' not in registry.")
+
+    async def _cmd_stop(self, msg: Message, target_name: str, params: dict):
+        if not target_name: self.log.warn(f"Cmd '{OS_CMD_STOP_SERVICE}' from {msg.sender} missing 'name'."); return
+        asyncio.create_task(self.stop_service(target_name,params))
+
+    async def _cmd_pause(self, msg: Message, target_name: str, params: dict):
+        svc=self.services.get(target_name) if target_name else None
+        if svc: await svc.pause()
+        else: self.log.warn(f"Cmd '{OS_CMD_PAUSE_SERVICE}': Svc '{target_name}' not found.")
+
+    async def _cmd_resume(self, msg: Message, target_name: str, params: dict):
+        svc=self.services.get(target_name) if target_name else None
+        if svc: await svc.resume()
+        else: self.log.warn(f"Cmd '{OS_CMD_RESUME_SERVICE}': Svc '{target_name}' not found.")
+
+    async def _cmd_shutdown(self, msg: Message, target_name: str, params: dict): await self.shutdown()
+
+    async def _cmd_save_storage(self, msg: Message, target_name: str, params: dict): await self._save_storage_async()
+
+    async def _cmd_get_status(self, msg: Message, target_name: str, params: dict): self._send_status_report(msg)
+
+    def _send_status_report(self, msg: Message):
+        status_payload={'services':{},'hardware_devices':{},'storage_dirty':self.is_storage_dirty()}
+        for sn,si in self.services.items(): status_payload['services'][sn]={'r':si.is_running,'p':si.is_paused,'c':si.is_critical}
+        if self.hardware_manager:status_payload['hardware_devices']=self.hardware_manager.get_drivers_status()
+        self.send_message('os',msg.sender,OS_MSG_TYPE_STATUS_REPORT,status_payload)
+
+    async def _cmd_reinit_hw(self, msg: Message, target_name: str, params: dict):
+        self.log.warn("Re-initializing HW Manager and drivers...");
+        if self.hardware_manager: await self.hardware_manager.cleanup_all_drivers()
+        await self._initialize_hardware_drivers(); self.log.warn("HW re-init complete.")
+
     async def run(self):
-        self.log.info(f"--- MicroOS Starting --- (Wake: {self.wake_reason_code})")
+        self.log.info(f"--- MicroOS Starting --- (Wake: {self.wake_reason_code}/{'/'.join(self.wake_sources) or 'cold'})")
         self._is_running=True; self._init_hardware_primitives(); await self._initialize_hardware_drivers()
         
-        svc_items=[{'n':n,'c':d.get('class'),'as':d.get('autostart',True),'cr':d.get('config',{}).get('is_critical',False),'so':d.get('start_order',100)} for n,d in self.svc_reg.items()]
-        svc_items.sort(key=lambda x:(x['so'],not x['cr']))
+        # (start_order, not critical, name, ...) sorts naturally; names are unique so cls is never compared
+        svc_items=[(d.get('start_order',100),not d.get('config',{}).get('is_critical',False),n,d.get('class'),d.get('autostart',True),d.get('wake_sources')) for n,d in self.svc_reg.items()]
+        svc_items.sort()
+        tiers={}
+        for item in svc_items: tiers.setdefault(item[0],[]).append(item[2])
+        self._stop_tiers=sorted(tiers.items(),reverse=True) # Reverse boot order
         
-        self.log.info("Starting services..."); failed_crit_svcs=[]
-        for item in svc_items:
-            n,cls,autostart,is_crit=item['n'],item['c'],item['as'],item['cr']
+        self.log.info("Starting services..."); failed_crit_svcs=[]; wake_names=self.wake_sources
+        for so,not_crit,n,cls,autostart,wake_srcs in svc_items:
+            is_crit=not not_crit
             if not autostart: self.log.info(f"Svc '{n}' autostart=False, skip."); continue
+            if wake_names and wake_srcs is not None and not any(w in wake_srcs for w in wake_names): # Warm wake: opted-in only
+                self.log.info(f"Svc '{n}' not in wake sources {wake_names}, skip."); continue
             if not cls or not isinstance(cls,type) or not issubclass(cls,Service): self.log.error(f"Invalid class for '{n}', skip."); continue
-            self.log.info(f"Attempting start: '{n}' (Order:{item['so']}, Crit:{is_crit})...")
+            self.log.info(f"Attempting start: '{n}' (Order:{so}, Crit:{is_crit})...")
             svc_inst = await self.create_service(n,cls)
             if not svc_inst:
                 self.log.error(f"Svc '{n}' FAILED to start.")
@@ -259,6 +354,10 @@ class MicroOS:
             self._save_storage(); await self.shutdown(graceful=False); return
         
         self.storage.setdefault('system_status','RUN_OK'); self.mark_storage_dirty()
+        # One save path only: the storage_saver service when it runs, else the OS flusher on the same interval setting
+        saver_cfg=self.svc_reg.get('storage_saver',{}).get('config',{})
+        self.flush_interval_ms=int(saver_cfg.get('save_interval_s',self.flush_interval_ms//1000)*1000)
+        if 'storage_saver' not in self.services: self._flusher_task = asyncio.create_task(self._storage_flusher())
         
         display_cfg=self.svc_reg.get('display',{}).get('config',{}); boot_layout=display_cfg.get('boot_status_layout')
         display_svc_name='display'
@@ -277,7 +376,11 @@ class MicroOS:
         if not self._is_running or self._shutdown_event.is_set(): self.log.info("Shutdown already in progress/OS not running."); return
         self.log.info(f"OS Shutdown requested (Graceful:{graceful}). Setting event."); self._shutdown_event.set()
         if graceful:
-            self.log.info("Stopping services gracefully..."); stop_tasks=[self.stop_service(n) for n in list(self.services.keys())]
+            self.log.info("Stopping services gracefully...")
+            for order,names in self._stop_tiers: # Same tier stops concurrently, tiers one after another
+                stop_tasks=[self.stop_service(n) for n in names if n in self.services]
+                if stop_tasks: await asyncio.gather(*stop_tasks,return_exceptions=True)
+            stop_tasks=[self.stop_service(n) for n in list(self.services.keys())] # Anything created outside the registry boot
             if stop_tasks: await asyncio.gather(*stop_tasks,return_exceptions=True)
             self.log.info("All services stopped.")
         else:
@@ -286,6 +389,7 @@ class MicroOS:
                 if svc._main_task and not svc._main_task.done(): svc._main_task.cancel()
                 if svc._message_processor_task and not svc._message_processor_task.done(): svc._message_processor_task.cancel()
             self.services.clear()
+        if self._flusher_task: self._flusher_task.cancel(); self._flusher_task = None
         self.log.info("Performing final storage save..."); self._save_storage()
         if self.hardware_manager: self.log.info("Cleaning up HW drivers..."); await self.hardware_manager.cleanup_all_drivers() # type: ignore
         self._is_running=False; self.log.info("--- MicroOS Shutdown Complete ---")
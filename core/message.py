@@ -1,23 +1,22 @@
-import time
+from time import ticks_ms as _ticks_ms
 
 class Message:
-    _id_counter = 0 #! Class variable for unique message IDs (optional, for debugging)
+    #! Payloads of broadcast messages are one dict shared by all recipients: treat msg.payload as read-only
+    __slots__ = ('sender', 'recipient', 'type', 'payload', '_ts') #! Fixed layout, no per-instance __dict__ (no dynamic attrs)
 
     def __init__(self, sender: str, recipient: str, msg_type: str, payload: dict = None):
         self.sender = sender
         self.recipient = recipient
         self.type = msg_type
         self.payload = payload if payload is not None else {}
-        self.timestamp = time.ticks_ms()
-        
-        # Message._id_counter += 1 #! Optional:
-        # self.id = Message._id_counter #! Optional:
+        self._ts = None #! Filled on first .timestamp read
+
+    @property
+    def timestamp(self): #! Lazy: ticks_ms() of first access, not of construction (nothing on the routing path reads it)
+        ts = self._ts
+        if ts is None: ts = self._ts = _ticks_ms()
+        return ts
 
     def __str__(self):
-        # Limit payload string length for concise logging
-        payload_str = str(self.payload)
-        if len(payload_str) > 70: #! Reduced length
-            payload_str = payload_str[:67] + '...'
-        # msg_id_str = f" (ID:{self.id})" if hasattr(self, 'id') else "" #! Optional
-        return f"Msg(from={self.sender}, to={self.recipient}, type={self.type}, p_keys={list(self.payload.keys())})"
-        # return f"Msg{msg_id_str}(from={self.sender}, to={self.recipient}, type={self.type}, payload={payload_str})"
\ No newline at end of file
+        # Key count only: no list/str(payload) allocation per log call
+        return 'Msg(from={}, to={}, type={}, n_keys={})'.format(self.sender, self.recipient, self.type, len(self.payload))
@@ -1,6 +1,5 @@
 import asyncio
 import sys
-import time
 from .message import Message
 from .constants import (
     OS_MSG_TYPE_HW_ACTION_RESPONSE, OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE,
@@ -9,47 +8,83 @@ from .constants import (
     OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_STORAGE_UPDATE
 )
 
-from lib.queue import Queue 
+from .inbox import RingInbox
 from utils import get_logger
 
+_EMPTY_LIST = []; _EMPTY_DICT = {} # Shared by every no-arg HW request payload: read-only by convention, never mutate
+_STOPPED_RESPONSE = {'request_ok': False, 'error': 'service_stopped'} # Same for every request cut short by stop(); read-only
+
+async def _set_after_ms(event, ms: int): # Timeout timer for Service._wait_event_timeout
+    await asyncio.sleep_ms(ms); event.set()
+
 class Service:
+    #! Invariant: one long-lived _message_processor task per start() drains the inbox and runs on_message inline.
+    #! on_message must not spawn a task per message; work for later goes back through self.inbox.put_nowait(...).
+    #! The inbox reuses its Message slots: msg is only valid until on_message returns (copy fields to keep them).
     def __init__(self, name: str, os_instance, config: dict):
         self.name=name; self.os=os_instance; self.config=config; self.log=get_logger(f"SVC:{self.name}",config.get('log_level'))
-        self.inbox=Queue(maxsize=config.get('inbox_size',20)); self._main_task=None; self._message_processor_task=None
-        self._running_event=asyncio.Event();self._stop_requested_event=asyncio.Event();self._paused_event=asyncio.Event();self._paused_event.set()
-        self.is_critical=config.get('is_critical',False); self._pending_hw_requests={}
+        self.inbox=RingInbox(config.get('inbox_size',20)); self._main_task=None; self._message_processor_task=None
+        # Run state is plain flags; Events are only allocated when something actually waits on them
+        self._running=False; self._stop_requested=False; self._paused=False; self._stop_event=None; self._resume_event=None
+        self.is_critical=config.get('is_critical',False)
+        self._msg_dispatch={ # msg.type -> handler: one dict lookup instead of a compare ladder in on_message
+            OS_MSG_TYPE_HW_ACTION_RESPONSE: self._on_hw_response, OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE: self._on_hw_response,
+            OS_MSG_TYPE_SERVICE_COMMAND: self._on_svc_cmd }
+        subs=config.get('subscribe_broadcasts') # Broadcast types to deliver; None (key absent) = every broadcast
+        self._subscribed_types=None if subs is None else frozenset(subs)
+        # In-flight HW requests live in a fixed set of reusable slots: request_id = slot | counter<<8, which stays below
+        # 2**24 and so always a MicroPython small int (no heap int, unlike the old ticks_us() ids)
+        n_slots=min(int(config.get('hw_slots',8)),256)
+        self._hw_slot_req=[None]*n_slots; self._hw_slot_resp=[None]*n_slots; self._hw_slot_event=[None]*n_slots; self._req_counter=0
 
     @property
-    def is_running(self): return self._running_event.is_set() and not self._stop_requested_event.is_set()
+    def is_running(self): return self._running and not self._stop_requested
     @property
-    def is_paused(self): return not self._paused_event.is_set()
+    def is_paused(self): return self._paused
+
+    def _ensure_stop_event(self) -> asyncio.Event:
+        if self._stop_event is None:
+            self._stop_event=asyncio.Event()
+            if self._stop_requested: self._stop_event.set()
+        return self._stop_event
+
+    async def wait_if_paused(self): # Run loops call this each cycle; no Event exists until the first pause()
+        if self._paused: await self._resume_event.wait() # type: ignore
 
     async def start(self):
         if self.is_running: self.log.warn("Svc already running."); return
-        if self._stop_requested_event.is_set(): self._stop_requested_event.clear()
+        if self._stop_requested:
+            self._stop_requested=False
+            if self._stop_event is not None: self._stop_event.clear()
         self.log.info(f"SVC:{self.name} Starting...");
         try:
-            await self.setup() 
+            pending=self.setup() # Sync by default; only overrides that do HW I/O return a coroutine
+            if pending is not None: await pending
             self._main_task = asyncio.create_task(self.run())
             self.log.debug(f"SVC:{self.name} _main_task:{self._main_task}")
+            # Single consumer per start(); an explicit check, since asserts are stripped in the opt=3 frozen build
+            if self._message_processor_task is not None: raise RuntimeError("message processor already running")
             self._message_processor_task = asyncio.create_task(self._message_processor())
             self.log.debug(f"SVC:{self.name} _msg_proc_task:{self._message_processor_task}")
-            self._running_event.set() 
+            self._running=True 
             self.log.info(f"SVC:{self.name} Started & tasks created.")
         except Exception as e:
             self.log.error(f"Setup/task creation fail for SVC:{self.name}: {e}")
-            self._running_event.clear() 
+            self._running=False 
             if self._main_task and not self._main_task.done(): self._main_task.cancel()
             if self._message_processor_task and not self._message_processor_task.done(): self._message_processor_task.cancel()
+            self._main_task=None; self._message_processor_task=None # So a later start() can create them again
             raise 
 
     async def stop(self): 
         # ... (stop logic from previous response - minor logging changes for brevity, assumed OK)
-        if self._stop_requested_event.is_set() or not self._running_event.is_set():
-            log_method = self.log.debug if self._stop_requested_event.is_set() else self.log.info
+        if self._stop_requested or not self._running:
+            log_method = self.log.debug if self._stop_requested else self.log.info
             log_method(f"SVC:{self.name} Stop: already stopping or not running.")
             return
-        self.log.info(f"SVC:{self.name} Stopping..."); self._stop_requested_event.set(); self._running_event.clear(); self._paused_event.set()
+        self.log.info(f"SVC:{self.name} Stopping..."); self._stop_requested=True; self._running=False; self._paused=False
+        if self._stop_event is not None: self._stop_event.set()
+        if self._resume_event is not None: self._resume_event.set()
         tasks_to_cancel = []
         if self._main_task and not self._main_task.done(): tasks_to_cancel.append(self._main_task)
         if self._message_processor_task and not self._message_processor_task.done(): tasks_to_cancel.append(self._message_processor_task)
@@ -57,76 +92,87 @@ class Service:
             await asyncio.gather(*[task.cancel() for task in tasks_to_cancel], return_exceptions=True) # Simpler cancel
             self.log.debug(f"SVC:{self.name} {len(tasks_to_cancel)} tasks cancellation processed.")
         self._main_task=None; self._message_processor_task=None
-        try: await self.cleanup()
-        except Exception as e: self.log.error(f"SVC:{self.name} Cleanup fail: {e}");sys.print_exception(e)
-        for req_id,data in list(self._pending_hw_requests.items()): 
-            data['response']={'request_id':req_id,'request_ok':False,'error':'service_stopped'}; data['event'].set()
-        self._pending_hw_requests.clear(); 
+        try:
+            pending=self.cleanup()
+            if pending is not None: await pending
+        except Exception as e:
+            self.log.error(f"SVC:{self.name} Cleanup fail: {e}")
+            if self.log.debug_enabled: sys.print_exception(e) # Tracebacks only at DEBUG
+        slot_resp=self._hw_slot_resp; slot_event=self._hw_slot_event
+        for i,req_id in enumerate(self._hw_slot_req): # Wake any request still waiting on a slot (no copy: slots aren't mutated here)
+            if req_id is not None: slot_resp[i]=_STOPPED_RESPONSE; slot_event[i].set()
         self.log.info(f"SVC:{self.name} Stopped.")
 
 
     async def pause(self): 
         if self.is_critical and not self.config.get('allow_pause_if_critical',False): self.log.info("Crit svc pause denied."); return
-        if self._paused_event.is_set(): self.log.info(f"SVC:{self.name} Pausing run loop..."); self._paused_event.clear()
+        if not self._paused:
+            self.log.info(f"SVC:{self.name} Pausing run loop..."); self._paused=True
+            if self._resume_event is None: self._resume_event=asyncio.Event()
+            else: self._resume_event.clear()
     
     async def resume(self): 
-        if not self._paused_event.is_set(): self.log.info(f"SVC:{self.name} Resuming run loop..."); self._paused_event.set()
+        if self._paused:
+            self.log.info(f"SVC:{self.name} Resuming run loop..."); self._paused=False
+            if self._resume_event is not None: self._resume_event.set()
     
     async def _message_processor(self): 
         self.log.debug(f"SVC:{self.name} Message processor task started.") #! Changed to debug
-        while not self._stop_requested_event.is_set():
+        while not self._stop_requested:
+            try: msg=await self.inbox.get()
+            except asyncio.CancelledError: self.log.info(f"SVC:{self.name} Message processor cancelled."); break
             try: 
-                msg=await self.inbox.get()
-                if msg: 
-                    # self.log.debug(f"SVC:{self.name} Processing msg: {msg}")
-                    await self.on_message(msg)
-                    self.inbox.task_done()
+                # self.log.debug(f"SVC:{self.name} Processing msg: {msg}")
+                await self.on_message(msg)
             except asyncio.CancelledError: self.log.info(f"SVC:{self.name} Message processor cancelled."); break
             except Exception as e: 
-                msg_str = str(msg)[:50] if 'msg' in locals() and msg else "N/A"
-                self.log.error(f"SVC:{self.name} MsgPrc err on msg '{msg_str}': {e}"); sys.print_exception(e)
+                self.log.error(f"SVC:{self.name} MsgPrc err on msg '{str(msg)[:50]}': {e}")
+                if self.log.debug_enabled: sys.print_exception(e) # Tracebacks only at DEBUG: an error storm costs one log line each
+            finally: self.inbox.task_done() # Slot goes back to the ring even if on_message raised
         self.log.debug(f"SVC:{self.name} Message processor task finished.") #! Changed to debug
     
-    async def setup(self): self.log.debug(f"SVC:{self.name} Base Svc setup.")
+    def setup(self): self.log.debug(f"SVC:{self.name} Base Svc setup.") # Plain def: overrides may be sync or async
     
     async def run(self): 
         self.log.debug(f"SVC:{self.name} Base Svc run loop. Waiting for pause event then sleeping.")
         try:
-            while not self._stop_requested_event.is_set(): 
-                await self._paused_event.wait()
+            while not self._stop_requested: 
+                await self.wait_if_paused()
                 await asyncio.sleep(3600) 
         except asyncio.CancelledError: self.log.info(f"SVC:{self.name} Base Svc run cancelled.")
-        except Exception as e: self.log.error(f"SVC:{self.name} Run loop error: {e}"); sys.print_exception(e)
+        except Exception as e:
+            self.log.error(f"SVC:{self.name} Run loop error: {e}")
+            if self.log.debug_enabled: sys.print_exception(e)
         finally: self.log.debug(f"SVC:{self.name} Base Svc run finished.")
     
     async def on_message(self, msg: Message):
         # self.log.debug(f"SVC:{self.name} on_message received: {msg}")
-        if msg.sender=='os' and (msg.type==OS_MSG_TYPE_HW_ACTION_RESPONSE or msg.type==OS_MSG_TYPE_HW_RESOURCE_LOCK_RESPONSE):
-            req_id = msg.payload.get('request_id')
-            # self.log.debug(f"SVC:{self.name} received HW resp for req_id {req_id}. OK: {msg.payload.get('request_ok')}")
-            pending_req = self._pending_hw_requests.get(req_id)
-            if pending_req:
-                # self.log.debug(f"SVC:{self.name} found pending req for {req_id}. Setting event.")
-                pending_req['response'] = msg.payload; pending_req['event'].set()
-            else: self.log.warn(f"SVC:{self.name} HW resp for unknown/timed-out req_id: {req_id}.")
-            return 
-        
-        if msg.type == OS_MSG_TYPE_SERVICE_COMMAND: 
-            # Check if this message is for this service instance, if 'target_service' is present
-            if msg.payload.get('target_service') and msg.payload.get('target_service') != self.name:
-                # This can happen if OS broadcasts a service command or sends to wrong service.
-                # self.log.debug(f"SVC:{self.name} Received SERVICE_COMMAND not targeted for self. Target: {msg.payload.get('target_service')}")
-                return
-            await self.handle_service_command(msg.payload)
+        # Broadcasts like storage_update have no base handler: child services override on_message to react to them
+        handler=self._msg_dispatch.get(msg.type)
+        if handler is not None: await handler(msg)
+
+    async def _on_hw_response(self, msg: Message):
+        if msg.sender=='os': self._deliver_hw_response(msg.payload) # Normally the OS calls _deliver_hw_response directly
+
+    async def _on_svc_cmd(self, msg: Message):
+        # Check if this message is for this service instance, if 'target_service' is present
+        target=msg.payload.get('target_service')
+        if target and target != self.name:
+            # This can happen if OS broadcasts a service command or sends to wrong service.
+            # self.log.debug(f"SVC:{self.name} Received SERVICE_COMMAND not targeted for self. Target: {target}")
             return
-        
-        # Handle broadcast messages like storage_update
-        if msg.recipient == OS_MSG_TYPE_BROADCAST and msg.type == OS_MSG_TYPE_STORAGE_UPDATE:
-            # self.log.debug(f"SVC:{self.name} received storage_update broadcast: {msg.payload.get('changed_keys')}")
-            # Child services can override this to react to specific key changes
-            pass # Base service might not do anything with it.
-        
-    async def cleanup(self): self.log.debug(f"SVC:{self.name} Base Svc cleanup.")
+        await self.handle_service_command(msg.payload)
+
+    def _deliver_hw_response(self, payload: dict):
+        """Fast path used by the OS for HW_ACTION responses: fills the request slot without a Message or inbox hop."""
+        req_id = payload.get('request_id')
+        # self.log.debug(f"SVC:{self.name} received HW resp for req_id {req_id}. OK: {payload.get('request_ok')}")
+        slot = req_id & 0xFF if isinstance(req_id, int) else -1
+        if 0 <= slot < len(self._hw_slot_req) and self._hw_slot_req[slot] == req_id: # Generation check drops stale replies
+            self._hw_slot_resp[slot] = payload; self._hw_slot_event[slot].set()
+        else: self.log.warn(f"SVC:{self.name} HW resp for unknown/timed-out req_id: {req_id}.")
+
+    def cleanup(self): self.log.debug(f"SVC:{self.name} Base Svc cleanup.") # Plain def: overrides may be sync or async
     
     def send_message(self, recipient: str, msg_type: str, payload: dict = None): 
         if not self.is_running and msg_type!=OS_MSG_TYPE_LOG: self.log.warn(f"SVC:{self.name} Send msg while not running (to={recipient},type={msg_type}).")
@@ -144,24 +190,42 @@ class Service:
             else: self.log.warn(f"SVC:{self.name} GET_INFO cmd missing reply_to target.")
         # Else: child services will handle their specific commands if they override this or on_message
 
+    @staticmethod
+    async def _wait_event_timeout(event, ms: int):
+        """Waits for event for up to ms. MicroPython asyncio has no loop.call_later, so a bare sleeper task plays the
+        timer: no wait_for wrapper task and no TimeoutError raised on the timeout path. The event only means "wake up":
+        callers decide success from their own result state (a response and the timer can both land before we resume)."""
+        if event.is_set(): return
+        timer = asyncio.create_task(_set_after_ms(event, ms))
+        try: await event.wait()
+        finally: timer.cancel() # Also when cancelled: an orphaned timer would set() the event after its slot is reused
+
     async def _request_hardware(self, device_name: str, method_name: str, timeout_s: float = 2.0, args: tuple = (), kwargs: dict = None) -> dict: #! Return type always dict
-        req_id=time.ticks_us(); payload={'request_id':req_id,'reply_to':self.name,'device':device_name,'method':method_name,'args':list(args),'kwargs':kwargs or {}}
-        resp_event=asyncio.Event(); self._pending_hw_requests[req_id]={'event':resp_event,'response':None}
+        slot_req=self._hw_slot_req
+        try: slot=slot_req.index(None)
+        except ValueError:
+            self.log.warn(f"SVC:{self.name} no free HW slot for {device_name}.{method_name}.")
+            return {'request_id':None,'request_ok':False,'error':'no_free_hw_slot'}
+        self._req_counter=gen=(self._req_counter+1)&0xFFFF; req_id=slot|(gen<<8); slot_req[slot]=req_id; self._hw_slot_resp[slot]=None
+        resp_event=self._hw_slot_event[slot]
+        if resp_event is None: resp_event=self._hw_slot_event[slot]=asyncio.Event() # Created once per slot, then reused
+        else: resp_event.clear()
+        payload={'request_id':req_id,'reply_to':self.name,'device':device_name,'method':method_name,'args':list(args) if args else _EMPTY_LIST,'kwargs':kwargs if kwargs else _EMPTY_DICT}
         
         self.os.send_message(self.name,'os',OS_MSG_TYPE_HW_ACTION,payload)
         # self.log.debug(f"SVC:{self.name} sent HW req {req_id} ({device_name}.{method_name}). Waiting...")
         
         try:
-            await asyncio.wait_for_ms(resp_event.wait(),int(timeout_s*1000))
+            await self._wait_event_timeout(resp_event,int(timeout_s*1000))
+            resp_data = self._hw_slot_resp[slot] # Filled by _deliver_hw_response (or stop()); None = timer woke us
+            if resp_data is None:
+                self.log.warn(f"SVC:{self.name} TIMEOUT waiting for req {req_id} ({device_name}.{method_name}).") 
+                return {'request_id':req_id,'request_ok':False,'error':'timeout_in_service_wait_event'}
             # self.log.debug(f"SVC:{self.name} event received for req {req_id}.") 
-            resp_data = self._pending_hw_requests[req_id].get('response')
-            # Ensure a dictionary is always returned, even if something went wrong with response storage
-            return resp_data if resp_data else {'request_id':req_id,'request_ok':False,'error':'internal_svc_no_resp_data'}
-        except asyncio.TimeoutError:
-            self.log.warn(f"SVC:{self.name} TIMEOUT waiting for req {req_id} ({device_name}.{method_name}).") 
-            return {'request_id':req_id,'request_ok':False,'error':'timeout_in_service_wait_event'}
+            return resp_data
         except Exception as e: 
-            self.log.error(f"SVC:{self.name} Wait HW resp error {req_id} ({device_name}.{method_name}): {e}");sys.print_exception(e)
+            self.log.error(f"SVC:{self.name} Wait HW resp error {req_id} ({device_name}.{method_name}): {e}")
+            if self.log.debug_enabled: sys.print_exception(e)
             return {'request_id':req_id,'request_ok':False,'error':f'exc_wait_svc: {e}'}
         finally:
-            if req_id in self._pending_hw_requests: del self._pending_hw_requests[req_id]
\ No newline at end of file
+            slot_req[slot]=None; self._hw_slot_resp[slot]=None
\ No newline at end of file
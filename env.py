@@ -2,23 +2,35 @@ from services import (ClockService, TemperatureService, StorageSaverService,
                       StatusDisplayService, AnalogInputService, PressureService,
                       LoraTxService)
 
+from machine import I2C, UART, Pin, ADC
+
+from core.constants import OS_MSG_TYPE_STORAGE_UPDATE, OS_MSG_TYPE_STORAGE_DIRTY
+
 from lib.lora_e220_constants import UARTBaudRate, UARTParity, AirDataRate, TransmissionPower22, FixedTransmission, WorPeriod, RssiEnableByte,LbtEnableByte
 
+# "wake_sources" (opcional): tupla de fuentes de despertar tras deep sleep en las que arranca el servicio,
+# p.ej. ("timer", "pin"). Sin la clave, el servicio arranca siempre. En arranque en frío arrancan todos.
+# "subscribe_broadcasts" (opcional, en "config"): tipos de broadcast que el OS entrega al servicio; () = ninguno.
+# Sin la clave, el servicio recibe todos los broadcasts.
 SERVICE_REGISTRY = {
     "clock": {
         "class": ClockService, "start_order": 10, "autostart": True,
         "config":{ "device_key": "rtc", "drift_check_interval_s": 60, 
                    "max_drift_s_before_resync": 10, "time_format": "%H:%M", 
-                   "date_format": "%d/%m/%y", "is_critical": True, "log_level": "INFO" }
+                   "date_format": "%d/%m/%y", "is_critical": True, "log_level": "INFO",
+                   "subscribe_broadcasts": () }
     },
     "temperature_monitor": { # Mantiene su propia lógica de lectura
         "class": TemperatureService, "start_order": 30, "autostart": True,
         "config":{ "device_key": "rtc", "read_interval_s": 5, # Lee temp del RTC cada 5s
-                   "is_critical": False, "log_level": "INFO" }
+                   "hysteresis_c": 0.05, "large_hysteresis_c": 0.5, # Cambios menores a 0.5C se publican como máximo cada 30s
+                   "min_publish_interval_s": 30,
+                   "is_critical": False, "log_level": "INFO", "subscribe_broadcasts": () }
     },
     "storage_saver":{ 
         "class": StorageSaverService, "start_order": 50, "autostart": True,
-        "config":{ "save_interval_s": 600, "is_critical": False, "log_level": "INFO" }
+        "config":{ "save_interval_s": 600, "is_critical": False, "log_level": "INFO",
+                   "subscribe_broadcasts": (OS_MSG_TYPE_STORAGE_DIRTY,) } # Despierta solo cuando el storage pasa a sucio
     },
     "display": {
         "class": StatusDisplayService, "start_order": 20, "autostart": True,
@@ -29,13 +41,14 @@ SERVICE_REGISTRY = {
             "rows": 2, "cols": 16,
             "display_time_format": "%H:%M", "display_date_format": "%d/%m/%y",
             "alternate_interval_s": 5, 
+            "subscribe_broadcasts": ("temperature_update", "pressure_update", OS_MSG_TYPE_STORAGE_UPDATE),
             "log_level": "DEBUG"
         }
     },
     "analog_reader": { 
         "class": AnalogInputService, "start_order": 35, "autostart": True,
         "config": {
-            "log_level": "INFO",
+            "log_level": "INFO", "subscribe_broadcasts": (),
             "inputs": {
                 "pressure_sensor_adc": { 
                     "pin_config_key": "pressure_adc", 
@@ -59,7 +72,8 @@ SERVICE_REGISTRY = {
             "V_TO_MPA_SLOPE": 12.5,  
             "V_TO_MPA_INTERCEPT": -1.25, 
             "PSI_PER_MPA": 145.038,
-            "broadcast_as": "pressure_update"
+            "broadcast_as": "pressure_update",
+            "subscribe_broadcasts": ()
         }
     },
     "lora_transmitter": { 
@@ -67,7 +81,7 @@ SERVICE_REGISTRY = {
         "start_order": 60, 
         "autostart": True,
         "config": {
-            "log_level": "DEBUG", 
+            "log_level": "DEBUG", "subscribe_broadcasts": (),
             "uart_bus_id_str": "1", # Corresponde a UART(1) en HARDWARE_CONFIGURATION
             "model_string": "900T30D", #! IMPORTANTE: Cambiar al modelo exacto de tu módulo E220. Ej: "433T22D", "868T20S", "915T30D"
             
@@ -103,6 +117,7 @@ STORAGE_REGISTRY = {
 }
 
 HARDWARE_CONFIGURATION = {
+    "verbose_errors": False, # True: HardwareManager imprime el traceback completo de cada fallo en execute_action
     "i2c": { 
         "1": { "sda": 21, "scl": 22, "freq": 100000 } 
     }, 
@@ -121,6 +136,28 @@ HARDWARE_CONFIGURATION = {
         # "lora_aux":     { "driver": "GPIO_Pin", "pin": 27, "mode": "IN" },
     }
 }
+
+def _build_hw_primitives_plan(hw_config):
+    # (key, clase, args, kwargs) por primitiva: claves y bus ids se resuelven aquí una sola vez (al importar / congelar),
+    # MicroOS._init_hardware_primitives solo instancia en orden.
+    plan = []; seen = set()
+    for bus_id_str, conf in hw_config.get('i2c', {}).items():
+        bus_id = int(bus_id_str)
+        plan.append((f"i2c_{bus_id}", I2C, (bus_id,), {'scl': Pin(conf['scl']), 'sda': Pin(conf['sda']), 'freq': conf.get('freq', 100000)}))
+    for bus_id_str, conf in hw_config.get('uart', {}).items():
+        bus_id = int(bus_id_str)
+        plan.append((f"uart_{bus_id}", UART, (bus_id,), {'baudrate': conf['baudrate'], 'tx': conf['tx'], 'rx': conf['rx']}))
+    for conf in hw_config.get('devices', {}).values():
+        driver_name = conf.get("driver"); pin_num = conf.get("pin")
+        if pin_num is None: continue
+        if driver_name == "GPIO_Pin": entry = (f"gpio_{pin_num}", Pin, (pin_num,), {})
+        elif driver_name == "ADC_Pin": entry = (f"adc_{pin_num}", ADC, (Pin(pin_num),), {})
+        else: continue
+        if entry[0] not in seen: seen.add(entry[0]); plan.append(entry)
+    return tuple(plan)
+
+HW_PRIMITIVES_PLAN = _build_hw_primitives_plan(HARDWARE_CONFIGURATION)
+
 STORAGE_PATH = 'data/storage.json'
 DEFAULT_LOG_LEVEL = "DEBUG"
 
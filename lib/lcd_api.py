@@ -144,7 +144,7 @@ class LcdApi:
             else:
                 self.cursor_x = self.num_columns
         else:
-            self.hal_write_data(ord(char))
+            self.hal_write_data(char if isinstance(char, int) else ord(char)) # ints when putstr is given bytes/bytearray
             self.cursor_x += 1
         if self.cursor_x >= self.num_columns:
             self.cursor_x = 0
@@ -161,6 +161,13 @@ class LcdApi:
         for char in string:
             self.putchar(char)
 
+    def write_at(self, cursor_x, cursor_y, string):
+        """Moves the cursor to (cursor_x, cursor_y) and writes string there,
+        so a positioned write is a single call.
+        """
+        self.move_to(cursor_x, cursor_y)
+        self.putstr(string)
+
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
         as chr(0) through chr(7).
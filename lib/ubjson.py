@@ -0,0 +1,99 @@
+# ubjson.py: minimal UBJSON (Universal Binary JSON, ubjson.org) codec for MicroPython
+#
+# Supported markers: Z (null), T/F (bool), i/U/I/l/L (int8/uint8/int16/int32/int64),
+# d/D (float32/float64), S (string), [ ] (array), { } (object).
+# Optimized containers ($ type / # count) and N/H/C markers are not supported.
+# Numbers are big-endian as required by the spec.
+
+import struct
+
+
+def _enc_int(o, buf):
+    if 0 <= o <= 255: buf.append(0x55); buf.append(o)                             # U
+    elif -128 <= o <= 127: buf.append(0x69); buf.extend(struct.pack('>b', o))     # i
+    elif -32768 <= o <= 32767: buf.append(0x49); buf.extend(struct.pack('>h', o)) # I
+    elif -2147483648 <= o <= 2147483647: buf.append(0x6C); buf.extend(struct.pack('>i', o)) # l
+    else: buf.append(0x4C); buf.extend(struct.pack('>q', o))                      # L
+
+
+def _enc_str_body(s, buf): # Length (as an int value) followed by UTF-8 bytes, no marker
+    data = s.encode('utf-8'); _enc_int(len(data), buf); buf.extend(data)
+
+
+def _enc(o, buf):
+    if o is None: buf.append(0x5A)
+    elif o is True: buf.append(0x54)
+    elif o is False: buf.append(0x46)
+    elif isinstance(o, int): _enc_int(o, buf)
+    elif isinstance(o, float): buf.append(0x44); buf.extend(struct.pack('>d', o))
+    elif isinstance(o, str): buf.append(0x53); _enc_str_body(o, buf)
+    elif isinstance(o, dict):
+        buf.append(0x7B)
+        for k, v in o.items():
+            if not isinstance(k, str): raise TypeError("UBJSON object keys must be str")
+            _enc_str_body(k, buf); _enc(v, buf)
+        buf.append(0x7D)
+    elif isinstance(o, (list, tuple)):
+        buf.append(0x5B)
+        for v in o: _enc(v, buf)
+        buf.append(0x5D)
+    else: raise TypeError("UBJSON cannot encode " + type(o).__name__)
+
+
+def dumps(obj) -> bytes:
+    buf = bytearray(); _enc(obj, buf)
+    return bytes(buf)
+
+
+def dump(obj, f):
+    f.write(dumps(obj))
+
+
+# Fixed-size numeric markers -> (struct format, byte size)
+_NUM = {0x69: ('>b', 1), 0x55: ('>B', 1), 0x49: ('>h', 2), 0x6C: ('>i', 4), 0x4C: ('>q', 8),
+        0x64: ('>f', 4), 0x44: ('>d', 8)}
+
+
+def _dec_len(data, pos):
+    fmt = _NUM.get(data[pos])
+    if fmt is None or fmt[0] in ('>f', '>d'): raise ValueError("UBJSON: bad length marker")
+    end = pos + 1 + fmt[1]
+    return struct.unpack(fmt[0], data[pos + 1:end])[0], end
+
+
+def _dec(data, pos):
+    m = data[pos]
+    if m == 0x5A: return None, pos + 1
+    if m == 0x54: return True, pos + 1
+    if m == 0x46: return False, pos + 1
+    fmt = _NUM.get(m)
+    if fmt is not None:
+        end = pos + 1 + fmt[1]
+        return struct.unpack(fmt[0], data[pos + 1:end])[0], end
+    if m == 0x53:
+        n, pos = _dec_len(data, pos + 1)
+        return bytes(data[pos:pos + n]).decode('utf-8'), pos + n
+    if m == 0x7B:
+        obj = {}; pos += 1
+        while data[pos] != 0x7D:
+            n, pos = _dec_len(data, pos)
+            key = bytes(data[pos:pos + n]).decode('utf-8')
+            obj[key], pos = _dec(data, pos + n)
+        return obj, pos + 1
+    if m == 0x5B:
+        arr = []; pos += 1
+        while data[pos] != 0x5D:
+            v, pos = _dec(data, pos); arr.append(v)
+        return arr, pos + 1
+    raise ValueError("UBJSON: unknown marker")
+
+
+def loads(data):
+    try: obj, end = _dec(memoryview(data), 0)
+    except IndexError: raise ValueError("UBJSON: truncated data")
+    if end != len(data): raise ValueError("UBJSON: trailing data")
+    return obj
+
+
+def load(f):
+    return loads(f.read())
@@ -0,0 +1,13 @@
+# Manifest para congelar los modulos del kernel en el firmware (ver README).
+# Uso: make BOARD=ESP32_GENERIC FROZEN_MANIFEST=/ruta/al/proyecto/manifest.py
+include("$(PORT_DIR)/boards/manifest.py")
+
+package("core", opt=3)
+
+# Utilidades (logger, filtros ADC, spline de linealización): bytecode y coeficientes literales en flash. La tabla
+# _SPLINE_LUT de utils/adc_helpers.py se calcula al importar y ocupa ~1 KB de heap, congelado o no.
+package("utils", opt=3)
+
+# Configuracion (SERVICE_REGISTRY, STORAGE_REGISTRY, HARDWARE_CONFIGURATION) conocida al compilar:
+# sus cadenas y bytecode quedan en flash. Un env.py subido al sistema de ficheros tiene prioridad sobre el congelado.
+module("env.py", opt=3)
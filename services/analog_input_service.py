@@ -1,19 +1,25 @@
 import asyncio
 import sys
 import time 
-from core import Service, Message
+import heapq
+from core import Service, Message, DeviceState
 from core.constants import OS_MSG_TYPE_BROADCAST, OS_CMD_STOP_SERVICE
 from utils import RunningMedianFilter, LINEARIZATION_FUNCTIONS
 
+_SCHED_REBASE_MS = 1 << 27 # Re-anchor schedule offsets well before ticks_diff's half-period limit
+_U16_ADC_METHODS = ('read', 'read_u16') # Raw counts that fit a uint16 filter; others (read_uv: µV) use a float filter
+
 class AnalogInputService(Service):
     def __init__(self, name: str, os_instance, config: dict):
         super().__init__(name, os_instance, config)
         self.inputs_config = config.get("inputs", {})
         self.adc_readers = {} 
+        self._schedule = []; self._sched_epoch = 0 # Min-heap of (deadline ms since _sched_epoch, logical_name)
+        self._pending_dirty = {} # Storage writes of the current cycle {key: value}, handed to the OS once by run()
         self.log.info(f"Initialized for ADC inputs: {list(self.inputs_config.keys())}")
 
-    async def setup(self):
-        await super().setup()
+    def setup(self):
+        super().setup()
         self.log.info("Setting up ADC inputs...")
         valid_inputs_found = False
         for logical_name, input_conf in self.inputs_config.items():
@@ -23,8 +29,7 @@ class AnalogInputService(Service):
                 continue
 
             if not self.os.hardware_manager or \
-               pin_config_key not in self.os.hardware_manager.drivers or \
-               self.os.hardware_manager.drivers[pin_config_key]['state'] != 'READY': # type: ignore
+               self.os.hardware_manager.get_device_state(pin_config_key) != DeviceState.READY: # type: ignore
                 self.log.error(f"ADC device '{pin_config_key}' for '{logical_name}' not configured or not READY. Skipping.")
                 continue
 
@@ -43,13 +48,13 @@ class AnalogInputService(Service):
             self.adc_readers[logical_name] = {
                 "pin_config_key": pin_config_key,
                 "interval_s": float(input_conf.get("read_interval_s", 1.0)), 
-                "filter": RunningMedianFilter(filter_size) if filter_size > 1 else None,
+                "interval_ms": int(float(input_conf.get("read_interval_s", 1.0)) * 1000), # Precomputed for the scheduler
+                "filter": RunningMedianFilter(filter_size, 'H' if adc_method in _U16_ADC_METHODS else None) if filter_size > 1 else None, # Median over raw samples
                 "lin_func": lin_func,
                 "broadcast_as": input_conf.get("broadcast_as", f"{logical_name}_value"),
                 "update_storage_key": input_conf.get("update_storage_key"), 
                 "adc_method": adc_method,         #! Guardar método ADC
                 "adc_max_value": adc_max_val,     #! Guardar valor máximo para normalización
-                "last_read_ticks": time.ticks_ms(), 
                 "last_processed_value": None, 
                 "value_change_threshold": float(input_conf.get("value_change_threshold", 0.005)) 
             }
@@ -58,6 +63,9 @@ class AnalogInputService(Service):
         
         if not valid_inputs_found:
             self.log.warn("No valid ADC inputs configured.")
+        self._sched_epoch = time.ticks_ms()
+        self._schedule = [(rc["interval_ms"], name) for name, rc in self.adc_readers.items()]
+        heapq.heapify(self._schedule)
 
     async def _read_and_process_adc(self, logical_name: str):
         reader_conf = self.adc_readers[logical_name]
@@ -73,30 +81,30 @@ class AnalogInputService(Service):
 
         if response and response.get('request_ok') and response.get('value') is not None:
             raw_adc_val = response.get('value')
-            normalized_value = raw_adc_val / adc_divisor #! Usar divisor configurado
 
             if reader_conf["filter"]:
-                reader_conf["filter"].add(normalized_value)
-                processed_value_norm = reader_conf["filter"].get_median()
+                reader_conf["filter"].add(raw_adc_val) # Raw samples; one float divide per output, after the median
+                median_raw = reader_conf["filter"].get_median()
+                if median_raw is None: return
+                processed_value_norm = median_raw / adc_divisor #! Usar divisor configurado
             else:
-                processed_value_norm = normalized_value
-            
-            if processed_value_norm is None: return
+                processed_value_norm = raw_adc_val / adc_divisor
 
             final_value = reader_conf["lin_func"](processed_value_norm) # type: ignore
             
             storage_key = reader_conf.get("update_storage_key")
             if storage_key:
-                current_storage_val = self.os.storage.get(storage_key)
+                storage = self.os.storage
+                current_storage_val = storage.get(storage_key)
                 # Actualizar solo si el valor es diferente para evitar dirty flag innecesario
                 if current_storage_val is None or abs(current_storage_val - final_value) > 1e-5: # Pequeña tolerancia para floats
-                    self.os.storage[storage_key] = final_value
-                    self.os.mark_storage_dirty([storage_key]) 
+                    self._pending_dirty[storage_key] = final_value # Written and marked dirty once per cycle in run()
                     # self.log.debug(f"ADC '{logical_name}' updated storage '{storage_key}' to {final_value:.4f}")
 
             last_val = reader_conf["last_processed_value"]
             threshold = reader_conf["value_change_threshold"]
             if last_val is None or abs(final_value - last_val) > threshold:
+                normalized_value = raw_adc_val / adc_divisor # Unfiltered sample, only needed for the log/broadcast
                 self.log.info(f"ADC '{logical_name}' ({pin_key}): RawADC={raw_adc_val}, Norm={normalized_value:.3f}, FiltNorm={processed_value_norm:.3f}, FinalV={final_value:.4f}")
                 payload = {'logical_name': logical_name, 'value': final_value, 
                            'raw_adc': raw_adc_val, 'normalized': normalized_value, 
@@ -110,31 +118,31 @@ class AnalogInputService(Service):
         # ... (igual que la versión anterior, sin cambios aquí) ...
         if not self.adc_readers:
             self.log.warn("AnalogInputSvc: No ADC inputs. Sleeping."); await super().run(); return
+        schedule = self._schedule; readers = self.adc_readers; pending_dirty = self._pending_dirty
+        #! Hot names bound once: each module/self attribute lookup in the loop is a dict lookup on MicroPython
+        ticks_ms = time.ticks_ms; ticks_diff = time.ticks_diff; ticks_add = time.ticks_add; sleep_ms = asyncio.sleep_ms
+        gather = asyncio.gather; heappop = heapq.heappop; heappush = heapq.heappush
+        wait_if_paused = self.wait_if_paused; read_adc = self._read_and_process_adc; mark_dirty = self.os.mark_storage_dirty
+        epoch = self._sched_epoch
         try:
             while self.is_running:
-                await self._paused_event.wait()
+                await wait_if_paused()
                 if not self.is_running: break
-                now = time.ticks_ms()
-                all_reads_done_this_cycle = True
-                for logical_name, reader_conf in self.adc_readers.items():
-                    interval_ms = int(reader_conf["interval_s"] * 1000)
-                    if time.ticks_diff(now, reader_conf["last_read_ticks"]) >= interval_ms:
-                        await self._read_and_process_adc(logical_name)
-                        reader_conf["last_read_ticks"] = now
-                    else: all_reads_done_this_cycle = False 
-                min_next_read_delay_ms = float('inf')
-                if not all_reads_done_this_cycle:
-                    for reader_conf in self.adc_readers.values():
-                        interval_ms = int(reader_conf["interval_s"] * 1000)
-                        elapsed_ms = time.ticks_diff(now, reader_conf["last_read_ticks"])
-                        remaining_ms = max(0, interval_ms - elapsed_ms)
-                        if remaining_ms < min_next_read_delay_ms: min_next_read_delay_ms = remaining_ms
-                else: 
-                    min_next_read_delay_ms = min(rc["interval_s"] for rc in self.adc_readers.values()) * 1000
-                sleep_ms = max(10, int(min_next_read_delay_ms)) 
-                await asyncio.sleep_ms(sleep_ms)
+                now = ticks_diff(ticks_ms(), epoch)
+                if now > _SCHED_REBASE_MS: # Shifting every key by the same amount keeps the heap valid
+                    epoch = self._sched_epoch = ticks_add(epoch, now)
+                    schedule[:] = [(deadline - now, name) for deadline, name in schedule]; now = 0
+                due = []
+                while schedule and schedule[0][0] <= now: due.append(heappop(schedule)[1])
+                if due: # All due reads in flight at once: one HW round trip of latency instead of one per input
+                    await gather(*[read_adc(name) for name in due])
+                    for name in due: heappush(schedule, (now + readers[name]["interval_ms"], name))
+                    if pending_dirty: # One notification for every storage write of this cycle
+                        mark_dirty(None, pending_dirty); pending_dirty.clear() # Values are copied into storage on the call
+                # Sleep exactly until the earliest deadline: O(log N) per read, no full scan or 10 ms floor
+                await sleep_ms(max(0, schedule[0][0] - ticks_diff(ticks_ms(), epoch)))
         except asyncio.CancelledError: self.log.info("AnalogInputSvc run loop cancelled.")
         except Exception as e: self.log.error(f"Error in AnalogInputSvc run: {e}"); sys.print_exception(e)
         finally: self.log.info("AnalogInputSvc run loop finished.")
 
-    async def cleanup(self): await super().cleanup(); self.log.info("AnalogInputSvc cleanup.")
\ No newline at end of file
+    def cleanup(self): super().cleanup(); self.log.info("AnalogInputSvc cleanup.")
\ No newline at end of file
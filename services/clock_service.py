@@ -9,16 +9,13 @@ from core.constants import (
 from core import Service, Message 
 from lib.urtc import DateTimeTuple, datetime_tuple 
 
-def _format_time_manual(fmt_str, time_tuple): #! Keep if time.strftime is problematic
-    s = fmt_str
-    s = s.replace("%H", "{:02d}".format(time_tuple[3]))
-    s = s.replace("%M", "{:02d}".format(time_tuple[4]))
-    s = s.replace("%S", "{:02d}".format(time_tuple[5]))
-    s = s.replace("%d", "{:02d}".format(time_tuple[2]))
-    s = s.replace("%m", "{:02d}".format(time_tuple[1]))
-    s = s.replace("%y", "{:02d}".format(time_tuple[0] % 100))
-    s = s.replace("%Y", "{}".format(time_tuple[0]))
-    return s
+def _zeller_weekday(y, m, d): # Gregorian weekday, Monday=0..Sunday=6 (machine.RTC / urtc convention)
+    if m < 3: m += 12; y -= 1
+    k = y % 100; j = y // 100
+    return ((d + 13 * (m + 1) // 5 + k + k // 4 + j // 4 + 5 * j) + 5) % 7 # Zeller gives Saturday=0
+
+_CLOCK_STATUS_TOPIC = 'clock_status_update' # Broadcast type of clock status updates
+_ACT_SET_SYSTEM_TIME = 'set_system_time'; _ACT_FORCE_DRIFT_CHECK = 'force_drift_check' # Command actions
 
 class ClockService(Service):
     def __init__(self, name: str, os_instance, config: dict):
@@ -29,18 +26,27 @@ class ClockService(Service):
         # time_format and date_format are not used by ClockService itself for broadcasting time strings anymore
         
         self.time_synced_initial = False
-        self.last_drift_check_ticks = 0
+        self._next_check_ticks = 0 # ticks_ms deadline of the next drift check
+        self._check_interval_ms = self.drift_check_interval_s * 1000
+        # Adaptive interval: doubles after each check with drift < 10% of the resync limit, up to this ceiling
+        self._max_interval_ms = int(config.get('max_drift_check_interval_s', 24 * self.drift_check_interval_s)) * 1000
+        self._adaptive_interval_ms = self._check_interval_ms
+        self._wake_event = asyncio.Event() # Set by force_drift_check to cut the sleep short (stop() cancels run)
         self.last_drift_s = 0.0
         self._initial_sync_done_in_run = False 
+        # Last status dict stored as storage['clock_info'] and sent as the broadcast payload (None until the first update).
+        # Broadcast payloads are shared read-only and may still sit in inboxes: each update builds a new dict
+        self._clock_status = None
+        self._dt_tuple = datetime_tuple # Bound once: module global lookups are dict lookups on MicroPython
         self.log.info(f"Initialized. RTC:'{self.rtc_device_key}',DriftChk:{self.drift_check_interval_s}s,MaxDrift:{self.max_drift_s_before_resync}s")
 
     async def _read_ds3231_datetime(self) -> DateTimeTuple | None:
         response = await self._request_hardware(device_name=self.rtc_device_key,method_name='datetime',timeout_s=2.5)
-        if response and response.get('request_ok') and response.get('value') is not None:
-            dt = response.get('value')
-            return dt if isinstance(dt, tuple) else None # type: ignore
-        self.log.error(f"Read DS3231 FAIL: {response.get('error','No/Bad Resp') if response else 'No HWM Resp'}")
-        return None
+        if not response: self.log.error("Read DS3231 FAIL: No HWM Resp"); return None
+        if not response['request_ok']: self.log.error(f"Read DS3231 FAIL: {response.get('error','No/Bad Resp')}"); return None
+        dt = response['value'] # Every request_ok response from the OS carries 'value'
+        if dt is None: self.log.error("Read DS3231 FAIL: No/Bad Resp"); return None
+        return dt if isinstance(dt, tuple) else None # type: ignore
 
     async def _write_ds3231_datetime(self, dt_to_write: DateTimeTuple) -> bool:
         self.log.info(f"Writing to DS3231: {dt_to_write}")
@@ -51,20 +57,18 @@ class ClockService(Service):
         return False
 
     def _datetime_tuple_to_machine_rtc_format(self, dt: DateTimeTuple | tuple) -> tuple | None:
-        try:
-            return (getattr(dt,'year',dt[0]), getattr(dt,'month',dt[1]), getattr(dt,'day',dt[2]),
-                    getattr(dt,'weekday',dt[3]), getattr(dt,'hour',dt[4]), getattr(dt,'minute',dt[5]),
-                    getattr(dt,'second',dt[6]), 0)
-        except (AttributeError, IndexError, TypeError) as e: self.log.error(f"Invalid DT for RTC conv: {dt}-{e}"); return None
+        try: # DateTimeTuple is a namedtuple with the same field order, so plain indexing covers both types
+            return (dt[0], dt[1], dt[2], dt[3], dt[4], dt[5], dt[6], 0)
+        except (IndexError, TypeError) as e: self.log.error(f"Invalid DT for RTC conv: {dt}-{e}"); return None
 
-    async def _set_machine_rtc_and_update_status(self, rtc_dt_tuple_for_machine: tuple, from_ds3231_read_success:bool = True) -> bool: #! Added flag
+    async def _set_machine_rtc_and_update_status(self, rtc_dt_tuple_for_machine: tuple, from_ds3231_read_success:bool = True, new_values: dict = None) -> bool: #! Added flag
         if not rtc_dt_tuple_for_machine: self.log.error("Cannot set machine.RTC: None tuple."); return False
         try:
-            self.os.system_rtc.datetime(rtc_dt_tuple_for_machine)
+            self._sys_rtc_datetime(rtc_dt_tuple_for_machine)
             self.log.info(f"System RTC (machine.RTC) set from tuple: {rtc_dt_tuple_for_machine[:7]}")
             # Now, update storage and broadcast status about the clock, not the time strings
             self.time_synced_initial = True # Mark as synced if we are setting it
-            self._update_clock_status_storage(ds3231_read_success=from_ds3231_read_success)
+            self._update_clock_status_storage(ds3231_read_success=from_ds3231_read_success, new_values=new_values)
             return True
         except Exception as e: 
             self.log.error(f"Set machine.RTC FAIL: {e}");sys.print_exception(e); return False
@@ -74,56 +78,61 @@ class ClockService(Service):
         resp = await self._request_hardware(self.rtc_device_key,'lost_power',timeout_s=1.5)
         if resp and resp.get('request_ok') and resp.get('value'):
             self.log.warn("OSF was set. Clearing...");
-            curr_rtc_tuple=self.os.system_rtc.datetime()
+            curr_rtc_tuple=self._sys_rtc_datetime()
             # Convert machine.RTC tuple to DateTimeTuple for writing to DS3231
             # machine.RTC weekday: 0-6 (Mon-Sun). urtc.datetime_tuple expects same or similar.
-            dt_write=datetime_tuple(curr_rtc_tuple[0],curr_rtc_tuple[1],curr_rtc_tuple[2],curr_rtc_tuple[3],
+            dt_write=self._dt_tuple(curr_rtc_tuple[0],curr_rtc_tuple[1],curr_rtc_tuple[2],curr_rtc_tuple[3],
                                     curr_rtc_tuple[4],curr_rtc_tuple[5],curr_rtc_tuple[6],0)
             if await self._write_ds3231_datetime(dt_write): self.log.info("OSF cleared by rewriting time to DS3231.")
             else: self.log.error("Failed to write time to DS3231 to clear OSF.")
         elif resp and resp.get('request_ok'): self.log.info("OSF is clear.")
         else: self.log.warn(f"Could not read OSF: {resp.get('error','No/Bad Resp') if resp else 'No HWM Resp'}")
 
-    async def setup(self):
-        await super().setup() 
+    def setup(self):
+        super().setup() 
         self.log.info(f"ClockSvc setup: RTC dev '{self.rtc_device_key}'. Config OK.")
-        if self.os.hardware_manager and self.rtc_device_key not in self.os.hardware_manager.drivers: # type: ignore
+        if self.os.hardware_manager and not self.os.hardware_manager.has_device(self.rtc_device_key): # type: ignore
             raise RuntimeError(f"RTC dev '{self.rtc_device_key}' not in HWM for ClockSvc.")
+        # Drift-check path callables, resolved once instead of walking self.os.<x>.<y> / time.<x> on every call
+        self._tuple2seconds = self.os.urtc_lib.tuple2seconds; self._sys_rtc_datetime = self.os.system_rtc.datetime
+        self._time_now = time.time; self._ticks_ms = time.ticks_ms; self._ticks_diff = time.ticks_diff
+        self._cmd_handlers = {_ACT_SET_SYSTEM_TIME: self._handle_set_system_time, # action -> bound handler
+                              _ACT_FORCE_DRIFT_CHECK: self._handle_force_drift_check}
         self.log.info("ClockSvc config validated. Initial sync in run().")
 
     async def _perform_initial_sync(self) -> bool:
         self.log.info(f"Performing initial clock sync from '{self.rtc_device_key}'...")
-        ds3231_dt = await self._read_ds3231_datetime()
+        ds3231_dt = await self._read_ds3231_datetime(); new_values = {} # Storage writes, handed to the OS in one call
         if ds3231_dt:
             rtc_tuple = self._datetime_tuple_to_machine_rtc_format(ds3231_dt)
-            if await self._set_machine_rtc_and_update_status(rtc_tuple, from_ds3231_read_success=True): # type: ignore
-                self.os.storage['system_status'] = "CLOCK_OK" 
-                self.os.mark_storage_dirty(['system_status']); self.log.info("Initial System RTC sync SUCCESS.")
+            if await self._set_machine_rtc_and_update_status(rtc_tuple, from_ds3231_read_success=True, new_values=new_values): # type: ignore
+                new_values['system_status'] = "CLOCK_OK" 
+                self.os.mark_storage_dirty(None, new_values); self.log.info("Initial System RTC sync SUCCESS.")
                 await self._check_and_clear_osf(); return True # OSF check after successful sync
-            else: self.os.storage['system_status'] = "CLK_ERR_SET"
-        else: self.os.storage['system_status'] = "CLK_ERR_READ"
-        self.os.mark_storage_dirty(['system_status']); return False
+            else: new_values['system_status'] = "CLK_ERR_SET"
+        else: new_values['system_status'] = "CLK_ERR_READ"
+        self.os.mark_storage_dirty(None, new_values); return False
+
+    def _update_clock_status_storage(self, ds3231_read_success: bool, new_drift: float = None, new_values: dict = None):
+        """Updates os.storage with clock status information and broadcasts it.
 
-    def _update_clock_status_storage(self, ds3231_read_success: bool, new_drift: float = None):
-        """Updates os.storage with clock status information and broadcasts it."""
+        With new_values, the storage writes are added there for the caller to hand to the OS in one batch."""
         if new_drift is not None:
             self.last_drift_s = new_drift
         
-        clock_status_data = {
-            'timestamp_epoch': time.time(), # When this status was generated
-            'drift_s': round(self.last_drift_s, 3),
-            'synced_initial': self.time_synced_initial,
+        clock_status_data = self._clock_status = { # New dict: the previous one may still be queued in an inbox
+            'timestamp_epoch': self._time_now(), # When this status was generated
+            'drift_s': round(self.last_drift_s, 3), 'synced_initial': self.time_synced_initial,
             'last_ds3231_read_success': ds3231_read_success,
-            'next_drift_check_s': self.drift_check_interval_s # Informational
-        }
+            'next_drift_check_s': self._adaptive_interval_ms // 1000 } # Informational: the adaptive sleep, not the base
         
-        self.os.storage['clock_drift_seconds'] = clock_status_data['drift_s'] # For direct access if needed
-        if 'clock_info' not in self.os.storage: self.os.storage['clock_info'] = {}
-        self.os.storage['clock_info'].update(clock_status_data)
-        self.os.mark_storage_dirty(['clock_drift_seconds', 'clock_info'])
+        # clock_drift_seconds: for direct access if needed. The OS writes both keys and skips unchanged ones
+        status_values = {'clock_drift_seconds': clock_status_data['drift_s'], 'clock_info': clock_status_data}
+        if new_values is not None: new_values.update(status_values)
+        else: self.os.mark_storage_dirty(None, status_values)
         
         # Broadcast clock *status* update, not the time itself frequently
-        self.send_message(OS_MSG_TYPE_BROADCAST, 'clock_status_update', clock_status_data)
+        self.send_message(OS_MSG_TYPE_BROADCAST, _CLOCK_STATUS_TOPIC, clock_status_data)
         self.log.debug(f"Clock STATUS Update Broadcast: Drift={clock_status_data['drift_s']:.1f}s, DS3231OK={ds3231_read_success}")
 
 
@@ -139,27 +148,36 @@ class ClockService(Service):
             # else: _perform_initial_sync calls _set_machine_rtc_and_update_status which broadcasts status
         
         if not self.time_synced_initial and self.is_running: self.log.warn("ClockSvc running, but initial sync unsuccessful.")
-        self.last_drift_check_ticks = time.ticks_ms()
+        ticks_ms = self._ticks_ms; ticks_diff = self._ticks_diff; wake = self._wake_event
+        self._next_check_ticks = time.ticks_add(ticks_ms(), self._adaptive_interval_ms)
 
         while self.is_running: 
-            await self._paused_event.wait() 
-            now_ticks=time.ticks_ms()
-            if time.ticks_diff(now_ticks, self.last_drift_check_ticks) >= (self.drift_check_interval_s * 1000):
-                self.last_drift_check_ticks=now_ticks
+            await self.wait_if_paused() 
+            now_ticks=ticks_ms()
+            if ticks_diff(self._next_check_ticks, now_ticks) <= 0:
+                planned = self._next_check_ticks = time.ticks_add(now_ticks, self._adaptive_interval_ms)
+                stable = False
                 self.log.info("Performing periodic Clock Drift check...")
                 
-                internal_rtc_epoch_before_read = time.time()
+                new_values = {} # Storage writes of this check, handed to the OS once at the end
+                internal_rtc_epoch_before_read = self._time_now()
                 ds3231_dt = await self._read_ds3231_datetime()
                 ds3231_epoch_s = None
                 read_ok = False
 
                 if ds3231_dt:
                     read_ok = True
-                    try: ds3231_epoch_s = self.os.urtc_lib.tuple2seconds(ds3231_dt)
+                    try: ds3231_epoch_s = self._tuple2seconds(ds3231_dt)
                     except Exception as e: self.log.warn(f"DS3231 time to epoch FAIL: {e}"); read_ok = False # Count as read failure if conversion fails
                 
-                if read_ok and ds3231_epoch_s is not None:
+                have_drift = read_ok and ds3231_epoch_s is not None
+                if have_drift:
                     current_drift = internal_rtc_epoch_before_read - ds3231_epoch_s
+                    stable = abs(current_drift) < 0.1 * self.max_drift_s_before_resync
+                # Back off while the clocks agree; significant drift or a failed read restores the configured interval.
+                # Set before the status updates below so their next_drift_check_s is the interval actually slept
+                self._adaptive_interval_ms = min(self._adaptive_interval_ms * 2, self._max_interval_ms) if stable else self._check_interval_ms
+                if have_drift:
                     self.log.info(f"Drift Check: InternalEpoch={internal_rtc_epoch_before_read}, DS3231Epoch={ds3231_epoch_s}, Drift={current_drift:.3f}s")
                     
                     if abs(current_drift) > self.max_drift_s_before_resync:
@@ -168,27 +186,29 @@ class ClockService(Service):
                         fresh_ds3231_dt = await self._read_ds3231_datetime()
                         if fresh_ds3231_dt:
                             rtc_m_tuple = self._datetime_tuple_to_machine_rtc_format(fresh_ds3231_dt)
-                            if await self._set_machine_rtc_and_update_status(rtc_m_tuple, from_ds3231_read_success=True): # type: ignore
+                            if await self._set_machine_rtc_and_update_status(rtc_m_tuple, from_ds3231_read_success=True, new_values=new_values): # type: ignore
                                 self.last_drift_s = 0.0 # Drift is now 0
                                 # _update_clock_status_storage is called by _set_machine_rtc_and_update_status
                             else: 
                                 self.log.error("Resync machine.RTC FAILED.")
-                                self._update_clock_status_storage(ds3231_read_success=False, new_drift=current_drift) # Report old drift
+                                self._update_clock_status_storage(ds3231_read_success=False, new_drift=current_drift, new_values=new_values) # Report old drift
                         else:
                             self.log.error("Read DS3231 for resync FAILED.")
-                            self._update_clock_status_storage(ds3231_read_success=False, new_drift=current_drift) # Report old drift
+                            self._update_clock_status_storage(ds3231_read_success=False, new_drift=current_drift, new_values=new_values) # Report old drift
                     else: # Drift is acceptable
-                        self._update_clock_status_storage(ds3231_read_success=True, new_drift=current_drift)
+                        self._update_clock_status_storage(ds3231_read_success=True, new_drift=current_drift, new_values=new_values)
                 else: # DS3231 read failed or conversion error
                     self.log.warn("Drift check: DS3231 read/conversion failed.")
-                    self._update_clock_status_storage(ds3231_read_success=False) # Don't update drift if read failed
+                    self._update_clock_status_storage(ds3231_read_success=False, new_values=new_values) # Don't update drift if read failed
+                if new_values: self.os.mark_storage_dirty(None, new_values)
+                if self._next_check_ticks == planned: # Not forced during the check: re-plan with the new interval
+                    self._next_check_ticks = time.ticks_add(now_ticks, self._adaptive_interval_ms)
             
-            # Sleep logic (wait_for_ms or simple sleep)
-            try:
-                await asyncio.wait_for_ms(self._stop_requested_event.wait(), min(self.drift_check_interval_s, 300) * 1000 // 4) # Check stop event periodically
-                if self._stop_requested_event.is_set(): break
+            # Sleep straight to the next deadline: one wait per check instead of one every quarter interval
+            wake.clear()
+            try: await asyncio.wait_for_ms(wake.wait(), max(0, ticks_diff(self._next_check_ticks, ticks_ms())))
             except asyncio.TimeoutError: pass # Normal timeout
-            except asyncio.CancelledError: raise
+            if self._stop_requested: break
 
         self.log.info("ClockService run loop finished.")
 
@@ -198,28 +218,30 @@ class ClockService(Service):
             payload=msg.payload; action=payload.get('action')
             if msg.payload.get('target_service') and msg.payload.get('target_service') != self.name: return 
 
-            if action == 'set_system_time': 
-                dt_data=payload.get('datetime_data')
-                if dt_data:
-                    try:
-                        curr_wd=time.localtime(time.time())[6]
-                        dt_set=datetime_tuple(dt_data['year'],dt_data['month'],dt_data['day'],
-                            dt_data.get('weekday',curr_wd),dt_data['hour'],dt_data['minute'],dt_data['second'],0)
-                        self.log.info(f"Cmd: set system time to: {dt_set}")
-                        if await self._write_ds3231_datetime(dt_set):
-                            new_dt=await self._read_ds3231_datetime()
-                            if new_dt:
-                                rtc_m=self._datetime_tuple_to_machine_rtc_format(new_dt)
-                                if await self._set_machine_rtc_and_update_status(rtc_m, from_ds3231_read_success=True): # type: ignore
-                                    self.last_drift_s=0.0; # Resets drift, status updated by call above
-                            else: self.log.error("Re-read DS3231 after set_system_time FAIL.")
-                        else: self.log.error("Write new time to DS3231 via cmd FAIL.")
-                    except (KeyError,TypeError,ValueError)as e: self.log.error(f"Invalid payload for 'set_system_time': {e}")
-                else: self.log.warn("'set_system_time' missing 'datetime_data'.")
-            elif action == 'force_drift_check': 
-                self.log.info("Forced drift check requested."); self.last_drift_check_ticks=0 
-            else: # Pass to base if not handled here and it's a service command
-                if msg.type == OS_MSG_TYPE_SERVICE_COMMAND:
-                    await super().handle_service_command(payload)
-    
-    async def cleanup(self): await super().cleanup(); self.log.info("Clock service cleanup.")
\ No newline at end of file
+            handler=self._cmd_handlers.get(action)
+            if handler is not None: await handler(payload)
+            elif msg.type == OS_MSG_TYPE_SERVICE_COMMAND: # Pass to base if not handled here and it's a service command
+                await super().handle_service_command(payload)
+
+    async def _handle_set_system_time(self, payload: dict):
+        dt_data=payload.get('datetime_data')
+        if not dt_data: self.log.warn("'set_system_time' missing 'datetime_data'."); return
+        try:
+            year=dt_data['year']; month=dt_data['month']; day=dt_data['day']; wd=dt_data.get('weekday')
+            if wd is None: wd=_zeller_weekday(year,month,day) # From the date being set, not the (maybe wrong) current RTC
+            dt_set=self._dt_tuple(year,month,day,wd,dt_data['hour'],dt_data['minute'],dt_data['second'],0)
+            self.log.info(f"Cmd: set system time to: {dt_set}")
+            if await self._write_ds3231_datetime(dt_set):
+                new_dt=await self._read_ds3231_datetime()
+                if new_dt:
+                    rtc_m=self._datetime_tuple_to_machine_rtc_format(new_dt)
+                    if await self._set_machine_rtc_and_update_status(rtc_m, from_ds3231_read_success=True): # type: ignore
+                        self.last_drift_s=0.0; # Resets drift, status updated by call above
+                else: self.log.error("Re-read DS3231 after set_system_time FAIL.")
+            else: self.log.error("Write new time to DS3231 via cmd FAIL.")
+        except (KeyError,TypeError,ValueError)as e: self.log.error(f"Invalid payload for 'set_system_time': {e}")
+
+    async def _handle_force_drift_check(self, payload: dict):
+        self.log.info("Forced drift check requested."); self._next_check_ticks=time.ticks_ms(); self._wake_event.set()
+
+    def cleanup(self): super().cleanup(); self.log.info("Clock service cleanup.")
\ No newline at end of file
@@ -1,12 +1,31 @@
 import asyncio
 import sys
 import time
-from core import Service
+from core import Service, DeviceState
 from core.constants import OS_CMD_STOP_SERVICE, OS_MSG_TYPE_OS_COMMAND 
 
-from lib.lora_e220 import LoRaE220 
+from lib.lora_e220 import LoRaE220, MAX_SIZE_TX_PACKET
 from lib.lora_e220_operation_constant import ResponseStatusCode, ModeType # ModeType podría no ser necesario
 
+_TX_FIELDS = ("tempC", "psi", "date_str", "time_str") # Positional order of the compiled formatter's arguments
+
+def _compile_fmt(template: str, names: tuple):
+    # Scans a str.format template once. If every field is a bare {name} from names, returns f(*values) doing a single
+    # '%s' interpolation (no field parsing or kwargs dict per call); otherwise falls back to template.format(**...).
+    out = []; order = []; i = 0; n = len(template)
+    while i < n:
+        c = template[i]
+        if c == '{' or c == '}':
+            if template.startswith(c + c, i): out.append(c); i += 2; continue
+            j = template.find('}', i) if c == '{' else -1
+            name = template[i + 1:j] if j > 0 else None
+            if name not in names: return lambda *v: template.format(**dict(zip(names, v)))
+            out.append('%s'); order.append(names.index(name)); i = j + 1; continue
+        out.append('%%' if c == '%' else c); i += 1
+    tmpl = ''.join(out); order = tuple(order)
+    if order == tuple(range(len(names))): return lambda *v: tmpl % v
+    return lambda *v: tmpl % tuple([v[k] for k in order])
+
 class LoraTxService(Service):
     def __init__(self, name: str, os_instance, config: dict):
         super().__init__(name, os_instance, config)
@@ -22,8 +41,11 @@ class LoraTxService(Service):
         self.pin_aux_key = config.get("pin_aux_config_key")
 
         self.transmit_interval_s = int(config.get("transmit_interval_s", 30))
+        self._tx_interval_ms = self.transmit_interval_s * 1000 # For sleep_ms in run()
         self.data_format_string = config.get("data_format_string", "T:{tempC},P:{psi}psi,D:{date_str},TS:{time_str}") #! Default con fecha/hora
         
+        self._fmt = None # Compiled data_format_string, built in setup()
+        self._last_date_key = None; self._last_date_str = "" # Size-1 cache: date_str only changes once a day
         self.uart_primitive = None 
         self.lora_module: LoRaE220 | None = None 
 
@@ -33,18 +55,19 @@ class LoraTxService(Service):
     async def _get_pin_instance(self, pin_key: str | None):
         if not pin_key: return None
         if self.os.hardware_manager and \
-           pin_key in self.os.hardware_manager.drivers and \
-           self.os.hardware_manager.drivers[pin_key]['state'] == 'READY': # type: ignore
-            return self.os.hardware_manager.drivers[pin_key]['instance'] # type: ignore
+           self.os.hardware_manager.get_device_state(pin_key) == DeviceState.READY: # type: ignore
+            return self.os.hardware_manager.get_device_instance(pin_key) # type: ignore
         self.log.warn(f"Pin '{pin_key}' not found or not ready in HWM. Will proceed without it if optional for LoRa lib.")
         return None
 
     async def setup(self):
-        await super().setup()
+        super().setup()
         self.log.info("Setting up LoRa E220 Transmitter...")
 
         if not self.model_string or self.model_string == "YOUR_LORA_MODEL":
             raise RuntimeError("LoRa E220: model_string is required and must be valid in configuration.")
+        self._fmt = _compile_fmt(self.data_format_string, _TX_FIELDS) # Parsed once, not on every TX
+        self._localtime = time.localtime; self._time = time.time # Bound once for the per-TX timestamp
 
         if self.os.hardware_primitives and self.uart_key in self.os.hardware_primitives:
             self.uart_primitive = self.os.hardware_primitives[self.uart_key]
@@ -74,6 +97,9 @@ class LoraTxService(Service):
             raise RuntimeError(f"LoRaE220 instantiation error: {e}") 
 
         self.log.info(f"LoRaE220 instance created. MCU-LoRa UART Baudrate: {uart_baudrate_mcu_to_lora}.")
+        # Async TX path (_tx_async) writes the UART directly instead of the library's busy-waiting send
+        self._baud = uart_baudrate_mcu_to_lora; self._uart_write = self.uart_primitive.write
+        self._tx_buf = bytearray(64) # Reused TX frame (message + CRLF); grown once if a message doesn't fit
         
         # begin() inicializa el UART del MCU a través de la librería y
         # intenta poner el módulo en modo normal (si los pines M0/M1 se proporcionan).
@@ -92,6 +118,25 @@ class LoraTxService(Service):
         self.log.info("LoRa Transmitter setup assumes LoRa module is pre-configured externally for transparent transmission and desired radio parameters.")
 
 
+    async def _tx_async(self, buf) -> int:
+        # Same steps as LoRaE220.send_transparent_message, but the wait for the module to take the packet yields to the
+        # scheduler (the library spins ~120 ms in managed_delay/AUX polling, stalling every other service).
+        n = len(buf)
+        if n > MAX_SIZE_TX_PACKET + 2: return ResponseStatusCode.ERR_E220_PACKET_TOO_BIG
+        written = self._uart_write(buf)
+        if written != n:
+            return ResponseStatusCode.ERR_E220_NO_RESPONSE_FROM_DEVICE if not written else ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH
+        aux = self.lora_module.aux # type: ignore
+        if aux is not None: # AUX goes high once the module has taken the packet
+            t0 = time.ticks_ms()
+            while aux.value() == 0:
+                if time.ticks_diff(time.ticks_ms(), t0) > 1000: return ResponseStatusCode.ERR_E220_TIMEOUT
+                await asyncio.sleep_ms(5)
+        else: await asyncio.sleep_ms(n * 10 * 1000 // self._baud + 5) # 10 bits per byte on the wire, plus margin
+        await asyncio.sleep_ms(20) # Settle time the library also waits after TX
+        self.uart_primitive.read() # type: ignore # Drop anything the module echoed back
+        return ResponseStatusCode.E220_SUCCESS
+
     async def run(self):
         if not self.lora_module:
             self.log.error("LoRa module not initialized. LoraTxService cannot run."); return
@@ -99,7 +144,7 @@ class LoraTxService(Service):
         self.log.info("LoraTxService run loop started.")
         try:
             while self.is_running:
-                await self._paused_event.wait()
+                await self.wait_if_paused()
                 if not self.is_running: break
 
                 # Obtener datos del almacenamiento del OS
@@ -108,9 +153,12 @@ class LoraTxService(Service):
                 
                 # Obtener fecha y hora actual
                 try:
-                    current_time_tuple = time.localtime(time.time()) # time.time() da segundos desde la época
-                    time_str = "{:02d}:{:02d}:{:02d}".format(current_time_tuple[3], current_time_tuple[4], current_time_tuple[5])
-                    date_str = "{:02d}/{:02d}/{:02d}".format(current_time_tuple[2], current_time_tuple[1], current_time_tuple[0] % 100)
+                    tt = self._localtime(self._time()) # time.time() da segundos desde la época
+                    time_str = "%02d:%02d:%02d" % (tt[3], tt[4], tt[5])
+                    dkey = (tt[0], tt[1], tt[2])
+                    if dkey != self._last_date_key:
+                        self._last_date_str = "%02d/%02d/%02d" % (tt[2], tt[1], tt[0] % 100); self._last_date_key = dkey
+                    date_str = self._last_date_str
                 except Exception as e:
                     self.log.warn(f"Could not get or format current time: {e}")
                     time_str = "HH:MM:SS"
@@ -122,24 +170,21 @@ class LoraTxService(Service):
                 
                 message_to_send = ""
                 try:
-                    message_to_send = self.data_format_string.format(
-                        tempC=temp_str, 
-                        psi=pressure_str,
-                        date_str=date_str,
-                        time_str=time_str
-                    )
+                    message_to_send = self._fmt(temp_str, pressure_str, date_str, time_str) # Order: _TX_FIELDS
                 except Exception as e:
                     self.log.error(f"Data formatting error with '{self.data_format_string}': {e}. Using raw values.")
                     message_to_send = f"T={temp_str},P={pressure_str},D={date_str},TS={time_str}" 
                 
-                # Añadir terminador de línea si es necesario para el receptor
-                full_lora_message = message_to_send + "\r\n" 
+                # Añadir terminador de línea si es necesario para el receptor (en el buffer reutilizado, sin str + "\r\n")
+                payload_bytes = message_to_send.encode(); n = len(payload_bytes)
+                if n + 2 > len(self._tx_buf): self._tx_buf = bytearray(n + 2)
+                tx_buf = self._tx_buf; tx_buf[:n] = payload_bytes; tx_buf[n] = 0x0D; tx_buf[n + 1] = 0x0A
                 
                 self.log.info(f"LoRa TX: Preparing to send: '{message_to_send}'") # Log sin \r\n
                 
                 # Enviar el mensaje usando transmisión transparente
                 # Esto asume que el módulo está en Modo 0 (Normal/Transmisión Transparente)
-                code = self.lora_module.send_transparent_message(full_lora_message)
+                code = await self._tx_async(memoryview(tx_buf)[:n + 2])
                 
                 if code == ResponseStatusCode.SUCCESS:
                     self.log.info(f"LoRa TX: Message sent successfully.")
@@ -148,14 +193,14 @@ class LoraTxService(Service):
                     # Pequeña pausa si falla el envío para no inundar de errores
                     await asyncio.sleep_ms(1000) 
                 
-                await asyncio.sleep(self.transmit_interval_s)
+                await asyncio.sleep_ms(self._tx_interval_ms)
 
         except asyncio.CancelledError: self.log.info("LoraTxService run loop cancelled.")
         except Exception as e: self.log.error(f"Unhandled error in LoraTxService run: {e}"); sys.print_exception(e)
         finally: self.log.info("LoraTxService run loop finished.")
 
-    async def cleanup(self):
-        await super().cleanup()
+    def cleanup(self):
+        super().cleanup()
         # La librería LoRaE220 podría tener un método `end()` o `close()` que podría ser llamado aquí.
         # self.lora_module.end() # Si existe y es apropiado.
         # Por ahora, la librería no parece requerir una limpieza explícita más allá de la deinit del UART que
@@ -2,7 +2,7 @@ import asyncio
 import sys
 import time 
 from core import Service, Message
-from core.constants import OS_MSG_TYPE_BROADCAST, OS_CMD_STOP_SERVICE 
+from core.constants import OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_SERVICE_COMMAND, OS_CMD_STOP_SERVICE 
 
 class PressureService(Service):
     def __init__(self, name: str, os_instance, config: dict):
@@ -16,43 +16,42 @@ class PressureService(Service):
         self.v_to_mpa_intercept = float(config.get("V_TO_MPA_INTERCEPT", -1.25)) #! Default al valor anterior
         self.psi_per_mpa = float(config.get("PSI_PER_MPA", 145.038))
         self.broadcast_as = config.get("broadcast_as", "pressure_update")
+        # V -> PSI folded into one line: psi = _k*V + _b (slope/intercept pre-scaled by PSI_PER_MPA)
+        self._k = self.v_to_mpa_slope * self.psi_per_mpa; self._b = self.v_to_mpa_intercept * self.psi_per_mpa
         
         self.current_pressure_psi = None
-        self.last_processed_voltage = None 
+        self._last_v_q = None # Last processed voltage quantized to 0.1 mV (int compare instead of float abs)
         self.log.info(f"Initialized. Reading V from storage '{self.voltage_storage_key}', update_interval:{self.read_interval_s}s. Slope:{self.v_to_mpa_slope}, Intercept:{self.v_to_mpa_intercept}")
 
-    async def setup(self):
-        await super().setup()
+    def setup(self):
+        super().setup()
         if not self.voltage_storage_key:
             raise RuntimeError("PressureService 'voltage_storage_key' not configured.")
+        # os.storage is only replaced while the OS loads it (before services exist), so its bound get stays valid
+        self._storage_get = self.os.storage.get; self._vkey = self.voltage_storage_key
         self.log.info("PressureService setup complete. Will periodically check voltage from storage.")
 
     async def _calculate_and_broadcast_pressure(self):
-        linearized_voltage = self.os.storage.get(self.voltage_storage_key) # type: ignore
-        
+        linearized_voltage = self._storage_get(self._vkey)
         if linearized_voltage is None: return 
-
-        if self.last_processed_voltage is not None and \
-           abs(self.last_processed_voltage - linearized_voltage) < 1e-4: #! Evitar recálculos si V no cambió mucho
-            return
-        
-        self.last_processed_voltage = linearized_voltage
+        q = int(linearized_voltage * 10000)
+        if q == self._last_v_q: return #! Evitar recálculos si V no cambió (mismo paso de 1e-4 V)
+        self._last_v_q = q
 
         try:
-            mpa = self.v_to_mpa_slope * float(linearized_voltage) + self.v_to_mpa_intercept
-            psi = round(mpa * self.psi_per_mpa) 
+            x = self._k * linearized_voltage + self._b # Storage already holds a float: no float() cast
+            psi = int(x + 0.5) if x >= 0 else int(x - 0.5) # Round half away from zero
 
             if self.current_pressure_psi != psi: 
-                self.log.info(f"Pressure updated: {psi} PSI (from V: {linearized_voltage:.4f}, MPA: {mpa:.3f})")
+                mpa = self.v_to_mpa_slope * linearized_voltage + self.v_to_mpa_intercept # Only needed for log/payload
+                if self.log.info_enabled: # Skip building the message when INFO is filtered out
+                    self.log.info("Pressure updated: %d PSI (from V: %.4f, MPA: %.3f)" % (psi, linearized_voltage, mpa))
                 self.current_pressure_psi = psi
-                self.os.storage['current_pressure_psi'] = self.current_pressure_psi
-                self.os.mark_storage_dirty(['current_pressure_psi']) 
+                self.os.mark_storage_dirty(None, {'current_pressure_psi': psi}) # OS writes it; unchanged = no dirty
                 
-                payload_out = {
-                    'psi': self.current_pressure_psi, 'mpa': round(mpa, 3),
-                    'source_voltage_key': self.voltage_storage_key, 'voltage_value': linearized_voltage
-                }
-                self.send_message(OS_MSG_TYPE_BROADCAST, self.broadcast_as, payload_out)
+                # A new payload per change (only when the PSI value moves): a sent broadcast may still be queued in inboxes
+                self.send_message(OS_MSG_TYPE_BROADCAST, self.broadcast_as, {'psi': psi, 'mpa': round(mpa, 3),
+                                  'source_voltage_key': self._vkey, 'voltage_value': linearized_voltage})
         except Exception as e:
             self.log.error(f"Error converting voltage to pressure: {e}. Voltage: {linearized_voltage}")
             sys.print_exception(e)
@@ -64,7 +63,7 @@ class PressureService(Service):
         self.log.info("PressureService run loop started.")
         try:
             while self.is_running:
-                await self._paused_event.wait()
+                await self.wait_if_paused()
                 if not self.is_running: break
                 await self._calculate_and_broadcast_pressure()
                 await asyncio.sleep(self.read_interval_s)
@@ -74,8 +73,8 @@ class PressureService(Service):
 
     async def on_message(self, msg: Message): 
         await super().on_message(msg)
-        if msg.type == "service_command": # OS_MSG_TYPE_SERVICE_COMMAND
+        if msg.type == OS_MSG_TYPE_SERVICE_COMMAND:
             await super().handle_service_command(msg.payload)
 
-    async def cleanup(self):
-        await super().cleanup(); self.log.info("PressureService cleanup."); self.current_pressure_psi = None
\ No newline at end of file
+    def cleanup(self):
+        super().cleanup(); self.log.info("PressureService cleanup."); self.current_pressure_psi = None
\ No newline at end of file
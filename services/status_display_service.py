@@ -9,31 +9,16 @@ from core.constants import (
     OS_MSG_TYPE_STORAGE_UPDATE 
 )
 
-def _format_time_manual_for_display(fmt_str, time_tuple):
-    s = fmt_str
-    s = s.replace("%H", "{:02d}".format(time_tuple[3]))
-    s = s.replace("%M", "{:02d}".format(time_tuple[4]))
-    s = s.replace("%S", "{:02d}".format(time_tuple[5])) 
-    s = s.replace("%d", "{:02d}".format(time_tuple[2]))
-    s = s.replace("%m", "{:02d}".format(time_tuple[1]))
-    s = s.replace("%y", "{:02d}".format(time_tuple[0] % 100))
-    s = s.replace("%Y", "{}".format(time_tuple[0]))
-    return s
+from utils import compile_time_format
 
-class StatusDisplayService(Service):
+def _diff_range(a, b): # [start, end) of a that differs from b; same-length rows only
+    n = len(a); i = 0
+    while i < n and a[i] == b[i]: i += 1
+    j = n
+    while j > i and a[j - 1] == b[j - 1]: j -= 1
+    return i, j
 
-    @staticmethod 
-    def _pad_str(text: str, width: int, align: str = 'left', fill_char: str = ' ') -> str:
-        try:
-            s_text = str(text); len_text = len(s_text)
-        except: return fill_char * width 
-        if len_text >= width: return s_text[:width]
-        padding_needed = width - len_text
-        if align == 'right': return (fill_char * padding_needed) + s_text
-        elif align == 'center':
-            lp = padding_needed // 2; rp = padding_needed - lp
-            return (fill_char * lp) + s_text + (fill_char * rp)
-        else: return s_text + (fill_char * padding_needed)
+class StatusDisplayService(Service):
 
     def __init__(self, name: str, os_instance, config: dict):
         super().__init__(name, os_instance, config)
@@ -44,34 +29,66 @@ class StatusDisplayService(Service):
         self.boot_status_duration_s = float(config.get('boot_status_duration_s', 7.0))
         self.time_format = config.get('display_time_format', "%H:%M") 
         self.date_format = config.get('display_date_format', "%d/%m/%y") 
+        self._time_fmt = compile_time_format(self.time_format); self._date_fmt = compile_time_format(self.date_format) # Parsed once
+        self._clock_slot_s = 1 if '%S' in self.time_format else 60; self._last_clock_slot = -1 # Clock text only changes once per slot
+        self._time_cache_slot = -1 # Slot whose localtime() the time/date strings were formatted from
         self.alternate_interval_s = float(config.get('alternate_interval_s', 5.0)) 
 
         self.lcd_cols = int(config.get('cols', 16)); self.lcd_rows = int(config.get('rows', 2))   
-        self.display_buffer = [self._pad_str("", self.lcd_cols) for _ in range(self.lcd_rows)] 
-        self.previous_display_buffer = [""] * self.lcd_rows; self.current_layout = "" 
+        # Rows are fixed-size bytearrays rewritten in place: no row object is allocated per refresh
+        self._spaces = memoryview(b" " * self.lcd_cols); self._unknown_row = bytes(self.lcd_cols)
+        self._left_spec = "{{:<{0}.{0}}}".format(self.lcd_cols) # e.g. "{:<16.16}": pads and truncates a row in one format call
+        self.display_buffer = [bytearray(self._spaces) for _ in range(self.lcd_rows)]
+        # What the LCD currently shows; zero bytes (never produced by layouts) mark cells whose content is unknown
+        self.previous_display_buffer = [bytearray(self.lcd_cols) for _ in range(self.lcd_rows)]; self.current_layout = "" 
         self.backlight_state = True; self._dirty = True 
+        self._dirty_event = asyncio.Event() # Wakes run() early when something marks the display dirty
         self._initial_lcd_check_done_in_run = False; self._showing_boot_status = False
         self.current_temp_str = "---.-"; self.current_pressure_str = "----" 
         self.current_time_str = "--:--"; self.current_date_str = "--/--/--"
         self.system_status_str = "---"; self.last_alternation_ticks = 0
+        self._alt_item = "temp" # Item shown on row 1; owned here, storage only mirrors it
         self.log.info(f"Initialized LCD '{self.lcd_device_key}' ({self.lcd_rows}x{self.lcd_cols}). Refresh: {self.refresh_interval_s}s")
     
+    def _mark_dirty(self): self._dirty = True; self._dirty_event.set()
+
+    def _pad_into(self, buf: bytearray, text, align: str = 'left'): # Space-padded/truncated copy of text into a row
+        if align == 'left': # Usual case: one format call yields the whole row, copied without any slicing
+            data = self._left_spec.format(str(text)).encode()
+            if len(data) == len(buf): buf[:] = data; return # Differs only for multi-byte UTF-8 text: general path below
+        data = str(text).encode(); width = len(buf); n = len(data)
+        if n >= width: buf[0:width] = memoryview(data)[:width]; return
+        pad = width - n; lp = pad if align == 'right' else pad // 2 if align == 'center' else 0
+        buf[0:lp] = self._spaces[:lp]; buf[lp:lp + n] = data; buf[lp + n:width] = self._spaces[:pad - lp]
+
+    def _blank_rows(self):
+        for row in self.display_buffer: row[:] = self._spaces
+
+    def _forget_lcd(self): # After a clear (or a failed write) the LCD content is unknown: the next redraw rewrites every row
+        for row in self.previous_display_buffer: row[:] = self._unknown_row
+
     def _update_local_cache(self): 
-        self.current_temp_str = f"{self.os.storage.get('current_temperature', -99.9): >5.1f}".replace("-99.9", "---.-")
-        self.system_status_str = self.os.storage.get('system_status', "INI").upper()[:3]
-        pressure_val = self.os.storage.get('current_pressure_psi')
-        self.current_pressure_str = f"{int(pressure_val): >4}" if pressure_val is not None else "----"
+        storage = self.os.storage
+        temp_val = storage.get('current_temperature') # None (no reading yet) or <= -99 (sensor sentinel) -> placeholder
+        self.current_temp_str = "---.-" if temp_val is None or temp_val <= -99.0 else "{:5.1f}".format(temp_val)
+        self.system_status_str = storage.get('system_status', "INI").upper()[:3]
+        pressure_val = storage.get('current_pressure_psi')
+        self.current_pressure_str = "----" if pressure_val is None else "{:4d}".format(int(pressure_val))
         try:
-            now_tuple = time.localtime(time.time())
-            self.current_time_str = _format_time_manual_for_display(self.time_format, now_tuple)
-            self.current_date_str = _format_time_manual_for_display(self.date_format, now_tuple)
+            now_s = int(time.time()); slot = now_s // self._clock_slot_s
+            if slot != self._time_cache_slot: # localtime() + formatting once per slot, not on every sensor-driven refresh
+                now_tuple = time.localtime(now_s)
+                self.current_time_str = self._time_fmt(now_tuple)
+                self.current_date_str = self._date_fmt(now_tuple)
+                self._time_cache_slot = slot
         except Exception as e:
             self.log.error(f"Error formatting time: {e}"); self.current_time_str="ER:ER"; self.current_date_str="ER/ER/ER"
 
-    async def setup(self): 
-        await super().setup()
+    def setup(self): 
+        super().setup()
+        self._alt_item = self.os.storage.get("display_alternating_item", "temp")
         self.log.info(f"DisplaySvc setup: LCD '{self.lcd_device_key}'. Config OK.")
-        if self.os.hardware_manager and self.lcd_device_key not in self.os.hardware_manager.drivers: # type: ignore
+        if self.os.hardware_manager and not self.os.hardware_manager.has_device(self.lcd_device_key): # type: ignore
             raise RuntimeError(f"LCD '{self.lcd_device_key}' not in HWM for DisplaySvc.")
         self.log.info("DisplaySvc config validated. Initial LCD check in run().")
 
@@ -80,7 +97,7 @@ class StatusDisplayService(Service):
         if not await self._lcd_command('clear', timeout_s=2.5): 
             self.log.error(f"LCD '{self.lcd_device_key}' FAILED initial 'clear'.")
             return False
-        self.previous_display_buffer = [""] * self.lcd_rows 
+        self._forget_lcd()
         await self._set_backlight(self.backlight_state) 
         await self.set_layout(self.default_layout, clear_display=False) 
         self.last_alternation_ticks = time.ticks_ms() 
@@ -96,24 +113,25 @@ class StatusDisplayService(Service):
                     self.send_message('os',OS_MSG_TYPE_OS_COMMAND,{'action':OS_CMD_STOP_SERVICE,'name':self.name,'params':{'reason':'crit_lcd_fail'}})
                     return 
                 else: self.log.warn(f"Initial LCD check FAILED. Display will not function.")
+        dirty_event = self._dirty_event; refresh_ms = int(self.refresh_interval_s * 1000)
         try:
             while self.is_running: 
-                await self._paused_event.wait() 
+                await self.wait_if_paused() 
                 now_ticks = time.ticks_ms()
                 if time.ticks_diff(now_ticks, self.last_alternation_ticks) >= (self.alternate_interval_s * 1000):
-                    current_item = self.os.storage.get("display_alternating_item", "temp")
-                    next_item = "pressure" if current_item == "temp" else "temp"
+                    self._alt_item = next_item = "pressure" if self._alt_item == "temp" else "temp"
+                    # Mirrored without mark_storage_dirty: no STORAGE_UPDATE or flash write for a UI toggle, it is saved with the next real change
                     self.os.storage["display_alternating_item"] = next_item
-                    self.os.mark_storage_dirty(["display_alternating_item"]) 
-                    self.last_alternation_ticks = now_ticks; self._dirty = True 
-                if not self._showing_boot_status: self._dirty = True 
+                    self.last_alternation_ticks = now_ticks; self._mark_dirty()
+                clock_slot = int(time.time()) // self._clock_slot_s # Redraw for the clock only when its text can change
+                if clock_slot != self._last_clock_slot: self._last_clock_slot = clock_slot; self._dirty = True
                 if self._dirty and not self._showing_boot_status:
                     self._update_local_cache(); self._update_display_buffer_content(); await self._redraw_lcd() 
                 
-                slept_s=0.0; chunk=0.2 
-                while slept_s < self.refresh_interval_s and self.is_running and self._paused_event.is_set():
-                    if self._dirty and not self._showing_boot_status: break 
-                    await asyncio.sleep(chunk); slept_s += chunk
+                if not self._dirty or self._showing_boot_status: # Sleep until marked dirty or the refresh interval ends
+                    try: await asyncio.wait_for_ms(dirty_event.wait(), refresh_ms)
+                    except asyncio.TimeoutError: pass
+                dirty_event.clear()
                 if not self.is_running: break
         except asyncio.CancelledError: self.log.info("DisplaySvc run loop cancelled.")
         except Exception as e: self.log.error(f"DisplaySvc run loop error: {e}"); sys.print_exception(e)
@@ -128,7 +146,7 @@ class StatusDisplayService(Service):
         if msg.type == 'temperature_update' or msg.type == 'pressure_update' or \
            (msg.type == OS_MSG_TYPE_STORAGE_UPDATE and \
             any(k in msg.payload.get('changed_keys',[]) for k in ['system_status','current_temperature', 'current_pressure_psi'])):
-            self._dirty = True 
+            self._mark_dirty()
         elif msg.type == OS_MSG_TYPE_SERVICE_COMMAND: 
              payload = msg.payload; action = payload.get('action')
              if payload.get('target_service') and payload.get('target_service') != self.name: return
@@ -149,28 +167,30 @@ class StatusDisplayService(Service):
             self.log.info(f"Setting display layout to: '{layout_name}' (Clear: {clear_display})")
             if clear_display:
                 await self._lcd_command('clear', timeout_s=1.5) 
-                self.previous_display_buffer = [""] * self.lcd_rows 
+                self._forget_lcd()
             self.current_layout = layout_name
             self._fill_buffer_from_layout_template() 
             self._update_local_cache(); self._update_display_buffer_content()    
-            self._dirty = True; return True 
+            self._mark_dirty(); return True 
         return False
 
     def _fill_buffer_from_layout_template(self): 
-        self.display_buffer = [self._pad_str("", self.lcd_cols) for _ in range(self.lcd_rows)]
+        self._blank_rows()
         if self.current_layout == "main_status": pass 
         elif self.current_layout == self.boot_status_layout_name: pass
         elif self.current_layout == "settings_menu": 
-            if self.lcd_rows > 0: self.display_buffer[0] = self._pad_str("> Option 1", self.lcd_cols)
-            if self.lcd_rows > 1: self.display_buffer[1] = self._pad_str("  Option 2", self.lcd_cols)
+            if self.lcd_rows > 0: self._pad_into(self.display_buffer[0], "> Option 1")
+            if self.lcd_rows > 1: self._pad_into(self.display_buffer[1], "  Option 2")
 
     def _update_display_buffer_content(self): 
-        if self.current_layout == "main_status":
-            if self.lcd_rows > 0:
+        layout = self.current_layout
+        if layout == "main_status":
+            rows = self.lcd_rows; buf = self.display_buffer; pad_into = self._pad_into
+            if rows > 0:
                 date_time_str = f"{self.current_date_str} {self.current_time_str}"
-                self.display_buffer[0] = self._pad_str(date_time_str, self.lcd_cols, align='left')
-            if self.lcd_rows > 1:
-                item_to_show = self.os.storage.get("display_alternating_item", "temp")
+                pad_into(buf[0], date_time_str, align='left')
+            if rows > 1:
+                item_to_show = self._alt_item
                 line1_content = ""
                 status_str = self.system_status_str 
                 if item_to_show == "temp":
@@ -178,28 +198,29 @@ class StatusDisplayService(Service):
                 elif item_to_show == "pressure":
                     line1_content = f"P:{self.current_pressure_str}psi {status_str}"
                 else: line1_content = f"{item_to_show[:5].upper()}: ??? {status_str}"
-                self.display_buffer[1] = self._pad_str(line1_content, self.lcd_cols)
-        elif self.current_layout == self.boot_status_layout_name: pass
+                pad_into(buf[1], line1_content)
+        elif layout == self.boot_status_layout_name: pass
     
     async def _redraw_lcd(self): 
-        something_written = False
-        for r_idx, new_line in enumerate(self.display_buffer):
-            if r_idx >= self.lcd_rows: break 
-            padded_line = self._pad_str(new_line, self.lcd_cols) 
-            if padded_line != self.previous_display_buffer[r_idx]:
-                if await self._lcd_command('move_to', 0, r_idx, timeout_s=0.6): 
-                    if await self._lcd_command('putstr', padded_line, timeout_s=1.0):
-                        self.previous_display_buffer[r_idx] = padded_line
-                        something_written = True
-                    else: self.log.warn(f"putstr FAIL on row {r_idx}.")
-                else: self.log.warn(f"move_to(0,{r_idx}) FAIL.")
-        
-        if something_written:
-            # No necesitas 'self.log_level_int'. self.log.debug() ya lo maneja.
-            self.log.debug(f"LCD L0: '{self.previous_display_buffer[0]}'") 
-            if self.lcd_rows > 1: self.log.debug(f"LCD L1: '{self.previous_display_buffer[1]}'")
+        self._dirty = False; something_written = False # Cleared up front so updates arriving mid-redraw trigger another pass
+        prev_rows = self.previous_display_buffer; rows = self.display_buffer
+        if rows == prev_rows: return # Common case once redraws are dirty-driven: no per-row loop at all
+        n_rows = self.lcd_rows; write_at = self._lcd_write_at; unknown_row = self._unknown_row # Loop-invariant, bound once
+        for r_idx, row in enumerate(rows):
+            if r_idx >= n_rows: break 
+            prev = prev_rows[r_idx]
+            if row != prev:
+                # Only the changed span goes on the bus (a ticking clock rewrites 1-2 chars, not the whole row)
+                start, end = _diff_range(row, prev)
+                prev[:] = row
+                # The span goes out as its own bytes: the HW action runs later in an OS task, and prev/row may be
+                # rewritten meanwhile (failure path below, _forget_lcd from set_layout/boot status), which would send NULs
+                if await write_at(start, r_idx, bytes(memoryview(row)[start:end]), timeout_s=1.0): something_written = True
+                else: self.log.warn(f"write_at({start},{r_idx}) FAIL."); prev[:] = unknown_row
         
-        self._dirty = False 
+        if something_written and self.log.debug_enabled:
+            self.log.debug(f"LCD L0: '{str(prev_rows[0], 'utf-8')}'") 
+            if n_rows > 1: self.log.debug(f"LCD L1: '{str(prev_rows[1], 'utf-8')}'")
     
     async def _set_backlight(self, state: bool) -> bool:
         if state != self.backlight_state:
@@ -210,57 +231,58 @@ class StatusDisplayService(Service):
         return False 
 
     async def _display_message_temporary_task(self, line1: str, line2: str = "", duration_ms: int = 2000): 
-        self.log.debug(f"Temp msg: '{line1}','{line2}' for {duration_ms}ms")
+        if self.log.debug_enabled: self.log.debug(f"Temp msg: '{line1}','{line2}' for {duration_ms}ms")
         original_layout=self.current_layout;
         paused_here=False
-        if self._paused_event.is_set(): await self.pause(); paused_here=True
-        temp_b = [self._pad_str("", self.lcd_cols) for _ in range(self.lcd_rows)]
-        if self.lcd_rows>0: temp_b[0]=self._pad_str(line1, self.lcd_cols)
-        if self.lcd_rows>1 and line2: temp_b[1]=self._pad_str(line2, self.lcd_cols)
-        original_previous_buffer = list(self.previous_display_buffer) 
-        self.previous_display_buffer=[""]*self.lcd_rows; self.display_buffer=temp_b; await self._redraw_lcd()
+        if not self._paused: await self.pause(); paused_here=True
+        self._blank_rows()
+        if self.lcd_rows>0: self._pad_into(self.display_buffer[0], line1)
+        if self.lcd_rows>1 and line2: self._pad_into(self.display_buffer[1], line2)
+        await self._redraw_lcd() # previous_display_buffer tracks the LCD, so the restore below only rewrites what differs
         await asyncio.sleep_ms(duration_ms)
-        self.previous_display_buffer = original_previous_buffer  
         self.current_layout=original_layout 
-        self.log.debug(f"Temp msg END: Restoring layout to '{self.current_layout}'.")
-        self._update_local_cache(); self._update_display_buffer_content(); self._dirty = True 
+        if self.log.debug_enabled: self.log.debug(f"Temp msg END: Restoring layout to '{self.current_layout}'.")
+        self._fill_buffer_from_layout_template(); self._update_local_cache(); self._update_display_buffer_content(); self._mark_dirty()
         if paused_here: await self.resume()
 
+    def _build_boot_status_pages(self, services_status: dict) -> list: # Every page rendered once, as full LCD rows
+        cols=self.lcd_cols; per_page=self.lcd_rows-1
+        max_name_len=max(1,cols-4) # Room for ":OK"/":NG" plus one spare column
+        header=bytearray(cols); self._pad_into(header,"Service Status:")
+        lines=[]
+        for svc_n,ok in tuple(services_status.items()): # One pass over (name, status) pairs, no per-name dict lookup
+            stat="OK" if ok else "NG"
+            disp_n=svc_n if len(svc_n)<=max_name_len else svc_n[:max_name_len-1]+"~"
+            row=bytearray(cols); self._pad_into(row,f"{disp_n}:{stat}"); lines.append(row)
+        pages=[]
+        for start in range(0,len(lines),per_page) if per_page>0 else ():
+            page=[header]+lines[start:start+per_page]
+            pages.append(page+[self._spaces]*(self.lcd_rows-len(page)))
+        if not pages: pages.append([header]+[self._spaces]*per_page)
+        return pages
+
     async def _display_boot_status_task(self, layout_name: str, services_status: dict): 
         self.log.info(f"Displaying boot status. Layout:'{layout_name}', Duration:{self.boot_status_duration_s}s")
         self._showing_boot_status = True; original_layout=self.current_layout 
         paused_here=False
-        if self._paused_event.is_set(): await self.pause(); paused_here=True
-        await self._lcd_command('clear',timeout_s=1.5); self.previous_display_buffer=[""]*self.lcd_rows
-        self.current_layout=layout_name; service_names=list(services_status.keys())
+        if not self._paused: await self.pause(); paused_here=True
+        await self._lcd_command('clear',timeout_s=1.5); self._forget_lcd()
+        self.current_layout=layout_name
         start_ticks=time.ticks_ms(); duration_ms=int(self.boot_status_duration_s*1000)
-        current_page=0; display_lines_available=max(0,self.lcd_rows-1)
+        pages=self._build_boot_status_pages(services_status); current_page=0
         while time.ticks_diff(time.ticks_ms(),start_ticks) < duration_ms:
-            self.display_buffer=[self._pad_str("",self.lcd_cols) for _ in range(self.lcd_rows)]
-            self.display_buffer[0]=self._pad_str("Service Status:",self.lcd_cols)
-            if self.lcd_rows>1 and display_lines_available>0:
-                start_svc_idx=current_page*display_lines_available
-                for i in range(display_lines_available):
-                    svc_idx=start_svc_idx+i; line_idx_in_buffer=i+1
-                    if line_idx_in_buffer>=self.lcd_rows: break
-                    if svc_idx<len(service_names):
-                        svc_n=service_names[svc_idx]; stat="OK" if services_status.get(svc_n,False) else "NG"
-                        max_name_len=self.lcd_cols-(len(stat)+2);
-                        if max_name_len<1: max_name_len=1
-                        disp_n=svc_n if len(svc_n)<=max_name_len else svc_n[:max_name_len-1]+"~"
-                        self.display_buffer[line_idx_in_buffer]=self._pad_str(f"{disp_n}:{stat}",self.lcd_cols)
-            self.previous_display_buffer=[""]*self.lcd_rows; await self._redraw_lcd()
+            page=pages[current_page]
+            for r_idx,row in enumerate(self.display_buffer): row[:]=page[r_idx]
+            await self._redraw_lcd()
             await asyncio.sleep_ms(2000)
-            if display_lines_available>0:
-                num_pages=(len(service_names)+display_lines_available-1)//display_lines_available
-                if num_pages > 0: current_page=(current_page+1)%num_pages # Ensure num_pages > 0 before modulo
+            current_page=(current_page+1)%len(pages)
             if not self.is_running or time.ticks_diff(time.ticks_ms(),start_ticks)>=duration_ms: break
         self.log.info("Boot status task: ENDING."); self._showing_boot_status=False
-        await self._lcd_command('clear',timeout_s=1.5); self.previous_display_buffer=[""]*self.lcd_rows
+        await self._lcd_command('clear',timeout_s=1.5); self._forget_lcd()
         layout_to_restore=original_layout if original_layout else self.default_layout
         self.current_layout=layout_to_restore
         self.log.info(f"Boot status END: Restored layout to '{self.current_layout}'.")
-        self._update_local_cache(); self._update_display_buffer_content(); self._dirty=True
+        self._fill_buffer_from_layout_template(); self._update_local_cache(); self._update_display_buffer_content(); self._mark_dirty()
         if paused_here: self.log.info("Boot status END: Resuming main run loop."); await self.resume()
         else: self.log.info("Boot status END: Main run loop not paused by this task.")
     
@@ -272,8 +294,11 @@ class StatusDisplayService(Service):
         if response and response.get('request_ok'): return True
         return False
     
+    async def _lcd_write_at(self, col: int, row: int, text, timeout_s: float = 1.0) -> bool: # move_to + putstr in one HW request
+        return await self._lcd_command('write_at', col, row, text, timeout_s=timeout_s)
+    
     async def cleanup(self):
-        await super().cleanup()
+        super().cleanup()
         self.log.info("Cleaning up display (final state)...")
         try: await self._lcd_command('clear',timeout_s=1.0); await self._set_backlight(False)
         except Exception as e: self.log.error(f"Error display final cleanup: {e}")
@@ -1,21 +1,29 @@
 import sys
 import asyncio
+import time
 from core import Service, Message 
 from core.constants import OS_MSG_TYPE_OS_COMMAND, OS_CMD_STOP_SERVICE, OS_MSG_TYPE_BROADCAST, OS_MSG_TYPE_SERVICE_COMMAND #! Added BROADCAST
 
+_TEMP_TOPIC = 'temperature_update' # Broadcast type of temperature readings
+_ACT_FORCE_READ_TEMP = 'force_read_temp'
+
 class TemperatureService(Service):
     def __init__(self, name: str, os_instance, config: dict):
         super().__init__(name, os_instance, config)
         self.read_interval_s = int(config.get('read_interval_s', 10)) #! Ensure int
         self.sensor_device_key = config.get('device_key', 'rtc') 
         self.last_temp_c = None
+        self.hysteresis_c = float(config.get('hysteresis_c', 0.05)) # Smallest change worth publishing
+        self.large_hysteresis_c = float(config.get('large_hysteresis_c', 0.5)) # Published immediately, ignoring the rate limit
+        self.min_publish_interval_ms = int(float(config.get('min_publish_interval_s', 0)) * 1000)
+        self._last_publish_ticks = 0
         self._initial_sensor_check_done_in_run = False
         self.log.info(f"Initialized. Sensor: '{self.sensor_device_key}', Interval: {self.read_interval_s}s")
     
-    async def setup(self):
-        await super().setup()
+    def setup(self):
+        super().setup()
         self.log.info(f"TempSvc setup: sensor '{self.sensor_device_key}'. Config OK.")
-        if self.os.hardware_manager and self.sensor_device_key not in self.os.hardware_manager.drivers: # type: ignore
+        if self.os.hardware_manager and not self.os.hardware_manager.has_device(self.sensor_device_key): # type: ignore
             raise RuntimeError(f"Sensor dev '{self.sensor_device_key}' not in HWM for TempSvc.")
         self.log.info("TempSvc config validated. Initial sensor check in run().")
 
@@ -35,24 +43,30 @@ class TemperatureService(Service):
         initial_temp = await self._read_temp_from_sensor()
         if initial_temp is not None:
             self.log.info(f"Sensor '{self.sensor_device_key}' verified. Initial temp: {initial_temp:.2f}C.")
-            self.last_temp_c = initial_temp 
-            self.os.storage['current_temperature'] = self.last_temp_c
-            self.os.mark_storage_dirty(['current_temperature']) #! Specify changed key
-            temp_data = {'value': self.last_temp_c, 'unit': 'C', 'source_device': self.sensor_device_key}
-            self.send_message(OS_MSG_TYPE_BROADCAST, 'temperature_update', temp_data) #! Use constant
+            self._publish(initial_temp, time.ticks_ms())
             return True
         self.log.error(f"Initial sensor check FAILED for '{self.sensor_device_key}'."); return False
 
-    async def process_temperature_reading(self):
+    def _publish(self, temp_c: float, now: int):
+        self.last_temp_c = temp_c; self._last_publish_ticks = now
+        self.os.mark_storage_dirty(None, {'current_temperature': temp_c}) # OS writes it; an unchanged value marks nothing
+        temp_data = {'value': temp_c, 'unit': 'C', 'source_device': self.sensor_device_key}
+        self.send_message(OS_MSG_TYPE_BROADCAST, _TEMP_TOPIC, temp_data) #! Use constant
+
+    async def process_temperature_reading(self, force: bool = False):
         temp_c = await self._read_temp_from_sensor()
         if temp_c is not None:
-            if self.last_temp_c is None or abs(self.last_temp_c - temp_c) > 0.05: 
-                self.log.info(f"Read Temp: {temp_c:.2f}C (Prev: {self.last_temp_c})")
-                self.last_temp_c = temp_c
-                self.os.storage['current_temperature'] = self.last_temp_c
-                self.os.mark_storage_dirty(['current_temperature']) #! Specify changed key
-                temp_data = {'value': self.last_temp_c, 'unit': 'C', 'source_device': self.sensor_device_key}
-                self.send_message(OS_MSG_TYPE_BROADCAST, 'temperature_update', temp_data) #! Use constant
+            last = self.last_temp_c
+            if last is None: delta = None
+            else:
+                delta = abs(last - temp_c)
+                if delta <= self.hysteresis_c: return
+            now = time.ticks_ms()
+            #! Small changes are rate limited; big jumps and forced reads go out at once
+            if delta is None or force or delta > self.large_hysteresis_c or \
+               time.ticks_diff(now, self._last_publish_ticks) >= self.min_publish_interval_ms:
+                self.log.info(f"Read Temp: {temp_c:.2f}C (Prev: {last})")
+                self._publish(temp_c, now)
         else: self.log.warn(f"Failed to read temp. Last known: {self.last_temp_c}")
 
     async def run(self):
@@ -70,7 +84,7 @@ class TemperatureService(Service):
 
         try:
             while self.is_running: 
-                await self._paused_event.wait()
+                await self.wait_if_paused()
                 if not self.is_running: break 
                 await self.process_temperature_reading()
                 
@@ -85,11 +99,11 @@ class TemperatureService(Service):
 
     async def on_message(self, msg: Message):
         await super().on_message(msg) 
-        if msg.type == OS_MSG_TYPE_OS_COMMAND and msg.payload.get('action') == 'force_read_temp':
+        if msg.type == OS_MSG_TYPE_OS_COMMAND and msg.payload.get('action') == _ACT_FORCE_READ_TEMP:
             self.log.info("Forced temperature read requested via command.")
-            await self.process_temperature_reading()
+            await self.process_temperature_reading(force=True)
         elif msg.type == OS_MSG_TYPE_SERVICE_COMMAND: #! Handle generic service commands
             await super().handle_service_command(msg.payload)
 
-    async def cleanup(self):
-        await super().cleanup(); self.log.info("Temperature service cleanup complete."); self.last_temp_c = None
\ No newline at end of file
+    def cleanup(self):
+        super().cleanup(); self.log.info("Temperature service cleanup complete."); self.last_temp_c = None
\ No newline at end of file
@@ -1,5 +1,6 @@
 from .log import get_logger, configure_default_log_level
 from .adc_helpers import RunningMedianFilter, LINEARIZATION_FUNCTIONS #! Exportar
+from .time_format import compile_time_format, format_time
 
 __all__ = ['get_logger', 'configure_default_log_level', 
-           'RunningMedianFilter', 'LINEARIZATION_FUNCTIONS']
\ No newline at end of file
+           'RunningMedianFilter', 'LINEARIZATION_FUNCTIONS', 'compile_time_format', 'format_time']
\ No newline at end of file
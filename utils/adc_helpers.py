@@ -1,3 +1,5 @@
+from array import array
+
 def _bisect_left(a, x, lo=0, hi=None):
     """Búsqueda binaria para encontrar posición de inserción."""
     if hi is None:
@@ -10,80 +12,140 @@ def _bisect_left(a, x, lo=0, hi=None):
             hi = mid
     return lo
 
+def _bisect_right(a, x, lo=0, hi=None):
+    """Como _bisect_left, pero a la derecha de los valores iguales a x."""
+    if hi is None:
+        hi = len(a)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < a[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+try: from bisect import bisect_left, bisect_right # C implementation where the port provides one
+except ImportError: bisect_left = _bisect_left; bisect_right = _bisect_right
+
+def _search_any(a, x, hi):
+    """bisect_left(a, x, 0, hi) para cualquier secuencia ordenada (ventanas float)."""
+    return bisect_left(a, x, 0, hi)
+
+try:
+    import micropython
+
+    # bisect_left sobre un array('H') compilado a código máquina (viper): muestras crudas del ADC
+    @micropython.viper
+    def _search_u16(a: ptr16, x: int, hi: int) -> int:
+        lo = 0
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if int(a[mid]) < x: lo = mid + 1
+            else: hi = mid
+        return lo
+except ImportError: # Not MicroPython
+    _search_u16 = _search_any
+
 class RunningMedianFilter:
     """
     Filtro de mediana móvil eficiente para MicroPython.
     Ventana de tamaño fijo.
+    typecode: None guarda muestras float ('f', 4 bytes cada una); un typecode de array (p.ej. 'H') guarda
+    enteros crudos del ADC sin conversión a float (normalizar después de la mediana).
+    Búfer circular y ventana ordenada son arrays contiguos de capacidad fija, reservados una sola vez:
+    add() solo desplaza elementos dentro de ellos (los 'count' primeros de la ventana son válidos).
     """
-    def __init__(self, size: int):
+    def __init__(self, size: int, typecode: str = None):
         if not isinstance(size, int) or size <= 0:
             raise ValueError("Filter size must be a positive integer")
         self.size = size
-        self.buffer = [0.0] * self.size # Circular buffer for raw values
-        self.window = [] # Sorted window of values
+        self.typecode = typecode
+        self._tc = typecode or 'f' # Storage typecode of buffer and window
+        self.buffer = self._new_buffer() # Circular buffer for raw values
+        self.window = self._new_buffer() # Sorted window of values; only window[:count] is valid
+        self._search = _search_u16 if typecode == 'H' else _search_any # (window, x, hi) -> insertion index
         self.count = 0   # Number of values added so far (up to size)
         self.index = 0   # Current index in the circular buffer
+        if size <= 2: # The median of 1 or 2 samples needs no sorted window: bind the direct versions once
+            self.add = self._add_small; self.get_median = self._median_one if size == 1 else self._median_two
+        else: # Parity of a full window is fixed by size: bind the matching median read once
+            self._mid = size // 2; self.get_median = self._median_odd if size % 2 else self._median_even
+
+    def _new_buffer(self):
+        return array(self._tc, [0] * self.size)
 
     def add(self, value: float):
         """Añade un nuevo valor al filtro."""
-        try:
-            value = float(value)
-        except ValueError:
-            # Handle non-float inputs if necessary, or let it raise
-            raise ValueError("Filter can only accept float values")
+        # Float filters convert other numbers; floats (the usual input) skip the call. Non-numbers raise from float()
+        if self.typecode is None and value.__class__ is not float: value = float(value)
 
+        window = self.window
         if self.count < self.size:
             # Phase 1: Filling the buffer and window
             self.buffer[self.index] = value
-            # Insert into sorted window
-            pos = _bisect_left(self.window, value)
-            self.window.insert(pos, value)
-            self.count += 1
+            # Insert into sorted window: shift the valid tail up one slot within the preallocated array
+            n = self.count; pos = self._search(window, value, n)
+            if pos < n: window[pos + 1:n + 1] = window[pos:n]
+            window[pos] = value
+            self.count = n + 1
         else:
             # Phase 2: Buffer is full, replace oldest value
             old_val = self.buffer[self.index]
             self.buffer[self.index] = value
             
-            # Remove old_val from sorted window
-            # This is the potentially slow part (O(N) for pop in list)
-            # For small N (e.g., < 20-30), it's usually acceptable in MicroPython
-            try:
-                self.window.pop(_bisect_left(self.window, old_val))
-            except IndexError: 
-                # Should not happen if old_val was in window.
-                # Could occur if float precision issues prevent exact match.
-                # Fallback: rebuild window (costly, but rare)
-                # print(f"WARN: Old value {old_val} not found precisely in filter window. Rebuilding.")
-                # self.window = sorted(self.buffer[:self.count]) 
-                pass # Or log an error if this happens frequently
-
-            # Insert new_val into sorted window
-            pos = _bisect_left(self.window, value)
-            self.window.insert(pos, value)
+            # Replace old_val by value in the sorted window with a single search for each
+            search = self._search; size = self.size
+            idx = search(window, old_val, size)
+            if idx < size and window[idx] == old_val:
+                pos = search(window, value, size)
+                if pos == idx or pos == idx + 1: window[idx] = value # New value sorts into the evicted slot: no shift at all
+                elif pos < idx: window[pos + 1:idx + 1] = window[pos:idx]; window[pos] = value # Shift the gap down to pos
+                else: window[idx:pos - 1] = window[idx + 1:pos]; window[pos - 1] = value # Shift the gap up to pos - 1
+            else: # Window out of sync with the buffer (should not happen: both hold the same stored values)
+                window[:] = array(self._tc, sorted(self.buffer))
         
         self.index = (self.index + 1) % self.size
 
+    def _add_small(self, value: float): # add() for size 1 and 2: circular buffer only
+        if self.typecode is None and value.__class__ is not float: value = float(value)
+        self.buffer[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size: self.count += 1
+
+    def _median_one(self) -> float | None:
+        return self.buffer[0] if self.count else None
+
+    def _median_two(self) -> float | None:
+        n = self.count
+        if n == 2: return (self.buffer[0] + self.buffer[1]) / 2.0
+        return self.buffer[0] if n else None
+
+    def _median_odd(self) -> float | None:
+        if self.count == self.size: return self.window[self._mid]
+        return RunningMedianFilter.get_median(self) # Still filling: generic path
+
+    def _median_even(self) -> float | None:
+        if self.count == self.size: w = self.window; m = self._mid; return (w[m - 1] + w[m]) / 2.0
+        return RunningMedianFilter.get_median(self) # Still filling: generic path
+
     def get_median(self) -> float | None:
         """Obtiene la mediana actual."""
-        if not self.window: # Or if self.count == 0
+        n = self.count
+        if not n:
             return None
             
         # Ensure window is sorted (should be if add() is correct)
         # self.window.sort() # Could add this for safety but impacts performance
             
-        mid_idx = len(self.window) // 2
-        if len(self.window) % 2 == 1: # Odd number of elements
+        mid_idx = n // 2
+        if n % 2 == 1: # Odd number of elements
             return self.window[mid_idx]
-        else: # Even number of elements
-            if mid_idx > 0 and mid_idx <= len(self.window): # Ensure valid indices
-                 return (self.window[mid_idx - 1] + self.window[mid_idx]) / 2.0
-            elif self.window: # If only one element (shouldn't happen with even check)
-                 return self.window[0]
-            return None # Should not be reached if window has elements
+        else: # Even number of elements (n >= 2, so mid_idx - 1 is valid)
+            return (self.window[mid_idx - 1] + self.window[mid_idx]) / 2.0
 
     def clear(self):
-        self.buffer = [0.0] * self.size
-        self.window = []
+        self.buffer = self._new_buffer()
+        self.window = self._new_buffer()
         self.count = 0
         self.index = 0
 
@@ -91,41 +153,57 @@ class RunningMedianFilter:
 # El valor 'x' de entrada aquí se espera que sea el valor normalizado del ADC (0.0 a 1.0)
 # raw_adc_reading / adc_max_value (e.g., 4095 for 12-bit)
 
+# Spline por tramos de custom_adc_to_voltage: el tramo i vale para _SPLINE_BREAKS[i-1] <= x < _SPLINE_BREAKS[i]
+# y se evalúa como a*t^3 + b*t^2 + c*t + d con t = x - x0. Ajusta aquí los coeficientes de tu calibración.
+_SPLINE_BREAKS = (0.1565, 0.2562, 0.3553, 0.4598, 0.5524, 0.6476, 0.7617) # Puntos de quiebre interiores
+_SPLINE_X_MAX = 0.9128 # Fin del rango calibrado (incluido)
+_SPLINE_N_BREAKS = len(_SPLINE_BREAKS)
+_SPLINE_SEGS = ( # (x0, a, b, c, d) por tramo
+    (0.0586, -0.5115, 0.0000, 1.0323, 0.1002),
+    (0.1565, 0.4063, -0.1503, 1.0176, 0.2008),
+    (0.2562, 0.6062, -0.0288, 0.9997, 0.3011),
+    (0.3553, -0.8909, 0.1515, 1.0119, 0.4006),
+    (0.4598, 2.1905, -0.1279, 1.0144, 0.5070),
+    (0.5524, -5.3610, 0.4803, 1.0470, 0.6015),
+    (0.6476, 0.2146, -1.0514, 0.9926, 0.7009),
+    (0.7617, 2.1566, -0.9780, 0.7612, 0.8008),
+)
+# Índice uniforme de tramos: celdas de ancho 1/_SPLINE_CELLS_PER_UNIT más estrechas que el menor tramo, así cada celda
+# contiene como mucho un punto de quiebre y basta int(x * N) y una comparación para hallar el tramo (sin búsqueda).
+_SPLINE_CELLS_PER_UNIT = 20
+_SPLINE_CELL_SEG = bytes(bisect_right(_SPLINE_BREAKS, k / _SPLINE_CELLS_PER_UNIT) # Tramo al inicio de cada celda
+                         for k in range(int(_SPLINE_X_MAX * _SPLINE_CELLS_PER_UNIT) + 1))
+
+def _spline_eval(x: float) -> float:
+    """Evalúa el spline exacto: tramo por el índice uniforme _SPLINE_CELL_SEG y forma de Horner."""
+    k = int(x * _SPLINE_CELLS_PER_UNIT)
+    i = _SPLINE_CELL_SEG[k] if k > 0 else 0
+    if i < _SPLINE_N_BREAKS and x >= _SPLINE_BREAKS[i]: i += 1 # Quiebre dentro de la celda
+    x0, a, b, c, d = _SPLINE_SEGS[i]
+    t = x - x0
+    return ((a * t + b) * t + c) * t + d
+
+# Tabla del spline muestreado en _SPLINE_LUT_N + 1 puntos uniformes de [0, _SPLINE_X_MAX], generada al importar
+# (1 KB en floats de 4 bytes). Con interpolación lineal el error frente al spline queda por debajo de ~1e-4,
+# el orden de los saltos del propio spline en sus puntos de quiebre y menor que 1 LSB de un ADC de 12 bits.
+_SPLINE_LUT_N = 256
+_SPLINE_LUT_SCALE = _SPLINE_LUT_N / _SPLINE_X_MAX
+_SPLINE_LUT = array('f', [_spline_eval(j / _SPLINE_LUT_SCALE) for j in range(_SPLINE_LUT_N + 1)])
+
 def custom_adc_to_voltage(x: float) -> float:
     """
     Convierte una lectura de ADC normalizada (0.0-1.0) a un valor linealizado 
     (por ejemplo, voltaje) usando splines por tramos.
-    Asegúrate de que los rangos (ej. x < 0.1565) sean exhaustivos y no se solapen.
+    Dentro del rango calibrado: dos lecturas de _SPLINE_LUT y una interpolación lineal, sin evaluar el polinomio.
+    Precondición: x es un número (AnalogInputService siempre pasa lectura / adc_max_value, un float); no se valida aquí.
     """
-    if not isinstance(x, (float, int)): return x # Return as is if not a number
-
-    # Ajusta estos rangos y ecuaciones según tu calibración específica.
-    # Es crucial que los puntos de quiebre (0.1565, 0.2562, etc.) sean correctos.
-    #if x < 0.0586:
-    #    return 0
-    if x < 0.1565:
-        return -0.5115 * (x - 0.0586)**3 + 0.0000 * (x - 0.0586)**2 + 1.0323 * (x - 0.0586) + 0.1002
-    elif x < 0.2562: # Usar elif para asegurar exclusividad
-        return 0.4063 * (x - 0.1565)**3 + -0.1503 * (x - 0.1565)**2 + 1.0176 * (x - 0.1565) + 0.2008
-    elif x < 0.3553:
-        return 0.6062 * (x - 0.2562)**3 + -0.0288 * (x - 0.2562)**2 + 0.9997 * (x - 0.2562) + 0.3011
-    elif x < 0.4598:
-        return -0.8909 * (x - 0.3553)**3 + 0.1515 * (x - 0.3553)**2 + 1.0119 * (x - 0.3553) + 0.4006
-    elif x < 0.5524:
-        return 2.1905 * (x - 0.4598)**3 + -0.1279 * (x - 0.4598)**2 + 1.0144 * (x - 0.4598) + 0.5070
-    elif x < 0.6476:
-        return -5.3610 * (x - 0.5524)**3 + 0.4803 * (x - 0.5524)**2 + 1.0470 * (x - 0.5524) + 0.6015
-    elif x < 0.7617:
-        return 0.2146 * (x - 0.6476)**3 + -1.0514 * (x - 0.6476)**2 + 0.9926 * (x - 0.6476) + 0.7009
-    elif x <= 0.9128: # Considera qué hacer si x > 0.9128
-        return 2.1566 * (x - 0.7617)**3 + -0.9780 * (x - 0.7617)**2 + 0.7612 * (x - 0.7617) + 0.8008   
-    
-    # Fallback si x está fuera de los rangos definidos (o para valores > 0.9128)
-    # Podrías extrapolar o devolver un valor de error/indicador.
-    # Por ahora, si es mayor que el último rango, podrías aplicar la última ecuación o una lineal simple.
-    # O simplemente devolver el valor normalizado si no encaja, indicando que está fuera del rango de calibración.
-    # print(f"ADC value {x} out of calibrated range for custom_adc_to_voltage")
-    return x # Devolver x si no está en ningún rango específico (o manejar como error)
+    # Fuera del rango calibrado (x > 0.9128) se devuelve el valor normalizado tal cual
+    if x > _SPLINE_X_MAX: return x
+    if x < 0.0: return _spline_eval(x) # Extrapolación del primer tramo, como antes
+    f = x * _SPLINE_LUT_SCALE; j = int(f)
+    if j >= _SPLINE_LUT_N: return _SPLINE_LUT[_SPLINE_LUT_N]
+    y0 = _SPLINE_LUT[j]
+    return y0 + (_SPLINE_LUT[j + 1] - y0) * (f - j)
 
 def simple_adc_passthrough(x: float) -> float:
     """Una función de linealización placeholder que no hace nada."""
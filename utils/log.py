@@ -1,19 +1,21 @@
-import time
+from time import ticks_ms as _ticks_ms # Bound once: no module attribute lookup per log line
 
 _DEFAULT_LOG_LEVEL_INTERNAL = "INFO"
 _CURRENT_LOG_LEVEL_NAME = _DEFAULT_LOG_LEVEL_INTERNAL
 _LOG_LEVEL_MAP = {'DEBUG': 0, 'INFO': 1, 'WARN': 2, 'ERROR': 3, 'CRITICAL': 4}
 _CURRENT_LOG_LEVEL_INT = _LOG_LEVEL_MAP.get(_CURRENT_LOG_LEVEL_NAME, 1)
 
+def _noop(msg): pass # Stored on the instance (not the class), so it is called without self
+
 def configure_default_log_level(level_name: str):
     global _CURRENT_LOG_LEVEL_NAME, _CURRENT_LOG_LEVEL_INT
     level_name_upper = level_name.upper()
     if level_name_upper in _LOG_LEVEL_MAP:
         _CURRENT_LOG_LEVEL_NAME = level_name_upper
         _CURRENT_LOG_LEVEL_INT = _LOG_LEVEL_MAP[level_name_upper]
-        # print(f"[{time.ticks_ms()}][LoggerUtil][INFO] Global log level set to: {_CURRENT_LOG_LEVEL_NAME}")
+        # print(f"[{_ticks_ms()}][LoggerUtil][INFO] Global log level set to: {_CURRENT_LOG_LEVEL_NAME}")
     else:
-        print(f"[{time.ticks_ms()}][LoggerUtil][ERROR] Invalid global log level for configuration: {level_name}")
+        print(f"[{_ticks_ms()}][LoggerUtil][ERROR] Invalid global log level for configuration: {level_name}")
 
 class Logger:
     def __init__(self, module_name: str, level_name: str = None):
@@ -27,21 +29,40 @@ class Logger:
                 self.effective_level_name = level_upper
                 self.effective_level_int = _LOG_LEVEL_MAP[level_upper]
             # else: fallback silently to global level
+        # Callers guard f-string building with these instead of comparing effective_level_int against copied level ints
+        self.debug_enabled = self.effective_level_int <= _LOG_LEVEL_MAP['DEBUG']
+        self.info_enabled = self.effective_level_int <= _LOG_LEVEL_MAP['INFO']
+        self.warn_enabled = self.effective_level_int <= _LOG_LEVEL_MAP['WARN']
+        self.error_enabled = self.effective_level_int <= _LOG_LEVEL_MAP['ERROR']
+        # Levels below the threshold are replaced once by _noop: a suppressed call skips even the level compare
+        lvl = self.effective_level_int
+        if lvl > 0: self.debug = _noop
+        if lvl > 1: self.info = _noop
+        if lvl > 2: self.warn = _noop
+        if lvl > 3: self.error = _noop
+
+    def _log(self, level: str, message: str): # Generic entry point; the level methods below skip the name lookup
+        level = level.upper(); msg_level_int = _LOG_LEVEL_MAP.get(level, 1)  # Default to INFO
+        if msg_level_int >= self.effective_level_int: self._emit(level, message)
+
+    def _emit(self, level: str, message: str): # level: already upper case and already past the threshold check
+        try:
+            log_msg = "[%d][%s][%s] %s" % (_ticks_ms(), self.module_name, level, message)
+        except Exception:
+            log_msg = "[RAW_LOG][%s][%s] Log formatting error, original message: %r" % (self.module_name, level, message)
+        print(log_msg)
 
-    def _log(self, level: str, message: str):
-        msg_level_int = _LOG_LEVEL_MAP.get(level.upper(), 1)  # Default to INFO
-        if msg_level_int >= self.effective_level_int:
-            try:
-                log_msg = f"[{time.ticks_ms()}][{self.module_name}][{level.upper()}] {message}"
-            except Exception:
-                log_msg = f"[RAW_LOG][{self.module_name}][{level.upper()}] Log formatting error, original message: {message}"
-            print(log_msg)
-
-    def debug(self, msg): self._log('DEBUG', msg)
-    def info(self, msg): self._log('INFO', msg)
-    def warn(self, msg): self._log('WARN', msg)
-    def error(self, msg): self._log('ERROR', msg)
-    def critical(self, msg): self._log('CRITICAL', msg)
+    # Suppressed calls cost one int compare: no upper(), no map lookup
+    def debug(self, msg):
+        if self.effective_level_int <= 0: self._emit('DEBUG', msg)
+    def info(self, msg):
+        if self.effective_level_int <= 1: self._emit('INFO', msg)
+    def warn(self, msg):
+        if self.effective_level_int <= 2: self._emit('WARN', msg)
+    def error(self, msg):
+        if self.effective_level_int <= 3: self._emit('ERROR', msg)
+    def critical(self, msg):
+        if self.effective_level_int <= 4: self._emit('CRITICAL', msg)
 
 def get_logger(module_name: str, service_log_level_name: str = None):
     return Logger(module_name, service_log_level_name)
@@ -0,0 +1,24 @@
+# Token strftime -> campo de str.format sobre (Y, m, d, H, M, S, Y % 100); otras secuencias '%x' se dejan literales
+_FMT_FIELDS = {'Y': '{0}', 'm': '{1:02d}', 'd': '{2:02d}', 'H': '{3:02d}', 'M': '{4:02d}', 'S': '{5:02d}', 'y': '{6:02d}'}
+_FMT_CACHE = {} # fmt_str -> formateador compilado
+
+def compile_time_format(fmt_str: str):
+    """
+    Compila un formato tipo strftime (%H %M %S %d %m %y %Y) una sola vez.
+    Devuelve f(time_tuple) -> str: una única llamada a str.format por uso, sin str.replace encadenados.
+    """
+    f = _FMT_CACHE.get(fmt_str)
+    if f is not None: return f
+    out = []; i = 0; n = len(fmt_str)
+    while i < n:
+        c = fmt_str[i]
+        if c == '%' and i + 1 < n and fmt_str[i + 1] in _FMT_FIELDS: out.append(_FMT_FIELDS[fmt_str[i + 1]]); i += 2; continue
+        out.append('{{' if c == '{' else '}}' if c == '}' else c); i += 1
+    fmt = ''.join(out).format
+    def f(tt): return fmt(tt[0], tt[1], tt[2], tt[3], tt[4], tt[5], tt[0] % 100)
+    _FMT_CACHE[fmt_str] = f
+    return f
+
+def format_time(fmt_str: str, time_tuple) -> str:
+    """Formatea time_tuple (orden de time.localtime / urtc) con fmt_str; el formato se compila en el primer uso."""
+    return compile_time_format(fmt_str)(time_tuple)